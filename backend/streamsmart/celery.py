@@ -1,6 +1,8 @@
 import os
 
 from celery import Celery
+from celery.signals import task_prerun, worker_init
+from django.db import close_old_connections
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'streamsmart.settings')
 
@@ -9,4 +11,16 @@ app = Celery('streamsmart')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # Load task modules from all registered Django apps.
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
+
+
+@worker_init.connect
+def configure_worker_connections(**kwargs):
+    from .db import use_persistent_connections
+    use_persistent_connections()
+
+
+@task_prerun.connect
+def check_database_connection(**kwargs):
+    # Replace a persistent connection that died or outlived its max age
+    close_old_connections()
@@ -0,0 +1,176 @@
+import collections
+import contextvars
+import logging
+import time
+import zlib
+
+from channels.exceptions import ChannelFull
+from channels_redis.core import RedisChannelLayer
+
+logger = logging.getLogger(__name__)
+
+# Sent through Redis to wake this process's blocked receiver; never delivered
+WAKEUP = "channel_layer.wakeup"
+
+# Channel the current task's receive() call is waiting on
+receiving_channel = contextvars.ContextVar("receiving_channel", default=None)
+
+# channels_redis's group_send script, with the expired-message sweep it
+# pipelines beforehand folded in: per key, drop expired messages, then push
+# the message unless the channel is over capacity. One round trip per shard.
+GROUP_SEND_LUA = """
+    local over_capacity = 0
+    local current_time = ARGV[#ARGV - 1]
+    local expiry = ARGV[#ARGV]
+    local expired_before = math.floor(tonumber(current_time)) - tonumber(expiry)
+    for i=1,#KEYS do
+        redis.call('ZREMRANGEBYSCORE', KEYS[i], 0, expired_before)
+        if redis.call('ZCOUNT', KEYS[i], '-inf', '+inf') < tonumber(ARGV[i + #KEYS]) then
+            redis.call('ZADD', KEYS[i], current_time, ARGV[i])
+            redis.call('EXPIRE', KEYS[i], expiry)
+        else
+            over_capacity = over_capacity + 1
+        end
+    end
+    return over_capacity
+"""
+
+
+class ShardedRedisChannelLayer(RedisChannelLayer):
+    """
+    Redis channel layer that shards groups across ``hosts`` with jump
+    consistent hashing (adding a shard only moves ~1/N of the rooms), and
+    delivers group messages to members in this process directly from memory.
+    Redis is only written for members connected to other processes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Group name -> channels in this process that joined it
+        self.local_groups = collections.defaultdict(set)
+        # Channel whose receive() holds the receive lock and is blocked on
+        # Redis; messages put in its buffer don't reach it until woken
+        self.blocked_receiver = None
+
+    def consistent_hash(self, value):
+        # Jump consistent hash (Lamping & Veach) over a CRC32 of the name
+        if self.ring_size == 1:
+            return 0
+        if isinstance(value, str):
+            value = value.encode("utf8")
+        key = zlib.crc32(value)
+        bucket, candidate = -1, 0
+        while candidate < self.ring_size:
+            bucket = candidate
+            key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+            candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+        return bucket
+
+    def is_local(self, channel):
+        """Whether the channel was created by this process's layer."""
+        return "!" in channel and self.non_local_name(channel).endswith(
+            self.client_prefix + "!"
+        )
+
+    async def group_add(self, group, channel):
+        await super().group_add(group, channel)
+        if self.is_local(channel):
+            self.local_groups[group].add(channel)
+
+    async def group_discard(self, group, channel):
+        await super().group_discard(group, channel)
+        members = self.local_groups.get(group)
+        if members is not None:
+            members.discard(channel)
+            if not members:
+                del self.local_groups[group]
+
+    async def flush(self):
+        self.local_groups.clear()
+        await super().flush()
+
+    async def receive(self, channel):
+        token = receiving_channel.set(channel)
+        try:
+            return await super().receive(channel)
+        finally:
+            receiving_channel.reset(token)
+
+    async def receive_single(self, channel):
+        if "!" not in channel:
+            return await super().receive_single(channel)
+
+        # Called by the receive lock holder for this process's channel. An
+        # empty channel list is a no-op delivery that sends the holder back
+        # to its own buffer.
+        receiver = receiving_channel.get()
+        if receiver is not None and not self.receive_buffer[receiver].empty():
+            return [], None
+        self.blocked_receiver = receiver
+        try:
+            message_channel, message = await super().receive_single(channel)
+        finally:
+            self.blocked_receiver = None
+        if message.get("type") == WAKEUP:
+            return [], None
+        return message_channel, message
+
+    async def wake(self, channel):
+        """Unblock ``channel``'s receive() after putting a message in its buffer."""
+        self.blocked_receiver = None
+        try:
+            await self.send(channel, {"type": WAKEUP})
+        except ChannelFull:
+            # Messages are already waiting in Redis and will wake it
+            pass
+
+    async def group_send(self, group, message):
+        assert self.require_valid_group_name(group), "Group name not valid"
+        key = self._group_key(group)
+        connection = self.connection(self.consistent_hash(group))
+
+        # Expire old members and read the group in one round trip
+        pipe = connection.pipeline()
+        pipe.zremrangebyscore(key, min=0, max=int(time.time()) - self.group_expiry)
+        pipe.zrange(key, 0, -1)
+        _, members = await pipe.execute()
+        channel_names = [x.decode("utf8") for x in members]
+
+        local = self.local_groups.get(group, ())
+        remote = [name for name in channel_names if name not in local]
+
+        if local:
+            # Round-trip through the serializer so local receivers get the
+            # same independent copy they would get from Redis
+            serialized = self.serialize(message)
+            for channel in list(local):
+                self.receive_buffer[channel].put_nowait(self.deserialize(serialized))
+            if self.blocked_receiver in local:
+                await self.wake(self.blocked_receiver)
+
+        if remote:
+            await self.send_to_remote(group, remote, message)
+
+    async def send_to_remote(self, group, channel_names, message):
+        """Push ``message`` to the given channels through their Redis shards."""
+        (
+            connection_to_channel_keys,
+            channel_keys_to_message,
+            channel_keys_to_capacity,
+        ) = self._map_channel_keys_to_connection(channel_names, message)
+
+        for connection_index, channel_redis_keys in connection_to_channel_keys.items():
+            connection = self.connection(connection_index)
+            args = [channel_keys_to_message[k] for k in channel_redis_keys]
+            args += [channel_keys_to_capacity[k] for k in channel_redis_keys]
+            args += [time.time(), int(self.expiry)]
+            over_capacity = await connection.eval(
+                GROUP_SEND_LUA, len(channel_redis_keys), *channel_redis_keys, *args
+            )
+            if over_capacity > 0:
+                logger.info(
+                    "%s of %s remote channels over capacity in group %s",
+                    over_capacity,
+                    len(channel_names),
+                    group,
+                )
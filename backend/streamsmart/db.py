@@ -0,0 +1,110 @@
+"""
+Database connection handling for the two kinds of process sharing these
+settings: the ASGI server, whose threads borrow from a psycopg connection
+pool, and Celery workers, which keep one persistent connection per process.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from channels.db import DatabaseSyncToAsync
+from django.conf import settings
+from django.db import connections
+
+
+class PooledDatabaseSyncToAsync(DatabaseSyncToAsync):
+    """
+    ``database_sync_to_async`` on a bounded thread pool. Channels' version is
+    thread-sensitive, which under daphne runs every consumer's queries one at
+    a time on a single shared thread; these run ASGI_DB_THREADS at once, each
+    call borrowing a pooled connection and handing it back when it returns.
+    """
+
+    executor = ThreadPoolExecutor(settings.ASGI_DB_THREADS, thread_name_prefix="asgi-db")
+    lock = threading.Lock()
+    # Calls awaiting a result, and those of them running on a thread
+    submitted = 0
+    running = 0
+
+    def __init__(self, func):
+        super().__init__(func, thread_sensitive=False, executor=self.executor)
+
+    async def __call__(self, *args, **kwargs):
+        self.count("submitted", 1)
+        try:
+            return await super().__call__(*args, **kwargs)
+        finally:
+            self.count("submitted", -1)
+
+    def thread_handler(self, loop, *args, **kwargs):
+        self.count("running", 1)
+        try:
+            return super().thread_handler(loop, *args, **kwargs)
+        finally:
+            self.count("running", -1)
+
+    @classmethod
+    def count(cls, name, delta):
+        with cls.lock:
+            setattr(cls, name, getattr(cls, name) + delta)
+
+
+database_sync_to_async = PooledDatabaseSyncToAsync
+
+
+def executor_stats():
+    """Busy and queued calls on the consumers' database threads."""
+    with PooledDatabaseSyncToAsync.lock:
+        submitted = PooledDatabaseSyncToAsync.submitted
+        running = PooledDatabaseSyncToAsync.running
+    threads = settings.ASGI_DB_THREADS
+    return {
+        "threads": threads,
+        "running": running,
+        "queued": max(0, submitted - running),
+        "utilization": round(running / threads, 3),
+    }
+
+
+def pool_stats(alias="default"):
+    """
+    Utilization and wait figures for this process's connection pool, or None
+    if the database isn't pooled. Counters are cumulative since startup.
+    """
+    pool = getattr(connections[alias], "pool", None)
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    size = stats.get("pool_size", 0)
+    in_use = size - stats.get("pool_available", 0)
+    max_size = stats.get("pool_max", 0)
+    # Requests that found no free connection and had to wait for one
+    queued = stats.get("requests_queued", 0)
+    wait_ms = stats.get("requests_wait_ms", 0)
+    return {
+        "min_size": stats.get("pool_min", 0),
+        "max_size": max_size,
+        "size": size,
+        "in_use": in_use,
+        "utilization": round(in_use / max_size, 3) if max_size else 0,
+        "waiting": stats.get("requests_waiting", 0),
+        "requests": stats.get("requests_num", 0),
+        "queued": queued,
+        "wait_ms_total": wait_ms,
+        "wait_ms_avg": round(wait_ms / queued, 1) if queued else 0,
+        "timeouts": stats.get("requests_errors", 0),
+        "connections_opened": stats.get("connections_num", 0),
+        "connections_lost": stats.get("connections_lost", 0),
+    }
+
+
+def use_persistent_connections(**kwargs):
+    """
+    ``worker_init`` handler: swap the pool for a persistent connection per
+    worker process. A prefork child runs one task at a time, so a pool buys
+    nothing there, and Celery's Django fixup closes pools after every task.
+    """
+    for alias in connections:
+        db = connections.settings[alias]
+        db.get("OPTIONS", {}).pop("pool", None)
+        db["CONN_MAX_AGE"] = settings.DB_WORKER_CONN_MAX_AGE
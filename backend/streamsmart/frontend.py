@@ -0,0 +1,130 @@
+"""
+Serving of the React SPA shell (``index.html``).
+
+The shell is hit on every client-side route, so it is kept in memory with
+precompressed gzip and brotli variants and strong ETags, and only re-read
+when its mtime changes.
+"""
+
+import gzip
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip is offered
+    brotli = None
+
+
+class ShellCache:
+    """In-memory copy of a file with an identity, gzip and brotli variant."""
+
+    def __init__(self, path, recheck_interval):
+        self.path = path
+        self.recheck_interval = recheck_interval
+        self.mtime = None
+        self.checked_at = 0
+        # Encoding -> (body, etag)
+        self.variants = {}
+
+    def get(self):
+        """Return the current variants, reloading if the file changed on disk."""
+        now = time.monotonic()
+        if now - self.checked_at >= self.recheck_interval:
+            self.checked_at = now
+            self.reload_if_changed()
+        return self.variants
+
+    def reload_if_changed(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            self.mtime, self.variants = None, {}
+            return
+        if mtime == self.mtime:
+            return
+
+        with open(self.path, "rb") as f:
+            body = f.read()
+        digest = hashlib.sha256(body).hexdigest()[:32]
+
+        # Strong ETags must differ per encoding, since the bytes differ
+        variants = {"identity": (body, f'"{digest}"')}
+        variants["gzip"] = (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gzip"')
+        if brotli is not None:
+            variants["br"] = (brotli.compress(body, quality=11), f'"{digest}-br"')
+
+        self.mtime, self.variants = mtime, variants
+
+
+def accepted_encodings(header):
+    """Parse an Accept-Encoding header into {coding: q}."""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(header, available):
+    accepted = accepted_encodings(header)
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = "identity", 0.0
+    # Brotli first: it wins ties, being the smaller of the two
+    for coding in ("br", "gzip"):
+        q = accepted.get(coding, wildcard)
+        if coding in available and q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def etag_matches(if_none_match, etag):
+    # If-None-Match uses weak comparison, so ignore W/ prefixes
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+shell = ShellCache(
+    os.path.join(settings.STATIC_ROOT, "index.html"),
+    recheck_interval=settings.FRONTEND_SHELL_RECHECK_INTERVAL,
+)
+# Load at startup so the first request doesn't pay for reading and compressing
+shell.get()
+
+
+def serve_frontend(request):
+    """Serve the React frontend for all non-API routes."""
+    variants = shell.get()
+    if not variants:
+        return HttpResponse("Frontend not found", status=404)
+
+    encoding = choose_encoding(request.headers.get("Accept-Encoding", ""), variants)
+    body, etag = variants[encoding]
+
+    if etag_matches(request.headers.get("If-None-Match", ""), etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type="text/html; charset=utf-8")
+        if encoding != "identity":
+            response["Content-Encoding"] = encoding
+
+    response["ETag"] = etag
+    response["Vary"] = "Accept-Encoding"
+    # Always revalidate: the shell points at the current hashed asset bundle
+    response["Cache-Control"] = "no-cache"
+    return response
@@ -87,6 +87,24 @@ if DATABASE_URL:
     DATABASES = {
         "default": dj_database_url.parse(DATABASE_URL)
     }
+    # Reused connections are pinged before use, so a dropped one isn't handed out
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
+    if os.environ.get("DB_POOL", "True").lower() in ("true", "1", "yes"):
+        # psycopg connection pool per process, shared by the ASGI server's
+        # threads. Pooling replaces persistent connections, so CONN_MAX_AGE
+        # must stay 0. Celery workers switch to persistent connections when
+        # they start (see streamsmart/db.py).
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"].setdefault("OPTIONS", {})["pool"] = {
+            "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", "10")),
+            # Seconds a caller waits for a free connection before erroring
+            "timeout": float(os.environ.get("DB_POOL_TIMEOUT", "10")),
+            # Seconds before idle connections above min_size are closed
+            "max_idle": float(os.environ.get("DB_POOL_MAX_IDLE", "300")),
+            # No "check": Django passes one itself when CONN_HEALTH_CHECKS is on
+        }
 else:
     DATABASES = {
         "default": {
@@ -95,6 +113,14 @@ else:
         }
     }
 
+# Threads running the WebSocket consumers' database calls; keep at or below
+# DB_POOL_MAX_SIZE so they don't queue on the pool
+ASGI_DB_THREADS = int(os.environ.get("ASGI_DB_THREADS", "8"))
+# Seconds a Celery worker process keeps its persistent connection
+DB_WORKER_CONN_MAX_AGE = int(os.environ.get("DB_WORKER_CONN_MAX_AGE", "600"))
+# Tasks between Celery's own connection recycles (it closes after every task otherwise)
+CELERY_DB_REUSE_MAX = int(os.environ.get("CELERY_DB_REUSE_MAX", "100"))
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -116,6 +142,11 @@ USE_TZ = True
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# Seconds between mtime checks of the in-memory SPA shell (index.html)
+FRONTEND_SHELL_RECHECK_INTERVAL = float(
+    os.environ.get("FRONTEND_SHELL_RECHECK_INTERVAL", "1" if DEBUG else "30")
+)
+
 # Use WhiteNoise for static files in production
 if not DEBUG:
     STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
@@ -134,30 +165,123 @@ REST_FRAMEWORK = {
 # Django Channels / Redis
 REDIS_URL = os.environ.get("REDIS_URL")
 
-if REDIS_URL:
-    # Production: Parse Redis URL
-    from urllib.parse import urlparse
-    redis_parsed = urlparse(REDIS_URL)
-    redis_host = redis_parsed.hostname or "localhost"
-    redis_port = redis_parsed.port or 6379
-    CHANNEL_LAYERS = {
-        "default": {
-            "BACKEND": "channels_redis.core.RedisChannelLayer",
-            "CONFIG": {
-                "hosts": [REDIS_URL],
-            },
-        },
-    }
-else:
-    # Local dev with Docker
-    CHANNEL_LAYERS = {
-        "default": {
-            "BACKEND": "channels_redis.core.RedisChannelLayer",
-            "CONFIG": {
-                "hosts": [("redis", 6379)],
-            },
+# Comma-separated Redis URLs to shard the channel layer across; rooms are
+# assigned to a shard by consistent hashing of their group name
+CHANNEL_REDIS_HOSTS = [
+    host for host in os.environ.get("CHANNEL_REDIS_HOSTS", "").split(",") if host
+]
+if not CHANNEL_REDIS_HOSTS:
+    # Production: REDIS_URL; local dev with Docker: the compose redis service
+    CHANNEL_REDIS_HOSTS = [REDIS_URL] if REDIS_URL else [("redis", 6379)]
+
+CHANNEL_LAYERS = {
+    "default": {
+        # Delivers to same-process group members in memory, Redis for the rest
+        "BACKEND": "streamsmart.channel_layers.ShardedRedisChannelLayer",
+        "CONFIG": {
+            "hosts": CHANNEL_REDIS_HOSTS,
+            # Messages buffered per channel before sends fail / drop
+            "capacity": int(os.environ.get("CHANNEL_LAYER_CAPACITY", "100")),
+            # Seconds an undelivered message lives
+            "expiry": int(os.environ.get("CHANNEL_LAYER_EXPIRY", "60")),
+            # Seconds a channel stays in a group without re-adding
+            "group_expiry": int(os.environ.get("CHANNEL_LAYER_GROUP_EXPIRY", "86400")),
         },
-    }
+    },
+}
+
+# Watch party room state (presence, roster) lives in Redis so any node can serve a room
+WATCHPARTY_REDIS_URL = REDIS_URL or "redis://redis:6379/0"
+# Seconds a room survives its host disconnecting, so a refresh doesn't end the party
+WATCHPARTY_HOST_GRACE_PERIOD = int(os.environ.get("WATCHPARTY_HOST_GRACE_PERIOD", "10"))
+# Seconds between each node's sweeps for rooms whose grace period ran out
+WATCHPARTY_REAPER_INTERVAL = float(os.environ.get("WATCHPARTY_REAPER_INTERVAL", "1"))
+# Seconds without a heartbeat before a participant is dropped from the roster
+WATCHPARTY_PRESENCE_TTL = int(os.environ.get("WATCHPARTY_PRESENCE_TTL", "30"))
+# Minimum seconds between presence heartbeat writes per connection
+WATCHPARTY_HEARTBEAT_INTERVAL = int(os.environ.get("WATCHPARTY_HEARTBEAT_INTERVAL", "10"))
+# Seconds to coalesce joins/leaves before broadcasting a roster diff
+WATCHPARTY_ROSTER_DIFF_INTERVAL = float(os.environ.get("WATCHPARTY_ROSTER_DIFF_INTERVAL", "0.5"))
+# EWMA weight given to each new RTT / clock-offset sample from ping/pong
+WATCHPARTY_LATENCY_SMOOTHING = float(os.environ.get("WATCHPARTY_LATENCY_SMOOTHING", "0.125"))
+# Per-room chat ring buffer, capped by message count and total bytes
+WATCHPARTY_CHAT_HISTORY_SIZE = int(os.environ.get("WATCHPARTY_CHAT_HISTORY_SIZE", "200"))
+WATCHPARTY_CHAT_HISTORY_BYTES = int(os.environ.get("WATCHPARTY_CHAT_HISTORY_BYTES", "262144"))
+WATCHPARTY_CHAT_MAX_MESSAGE_BYTES = int(os.environ.get("WATCHPARTY_CHAT_MAX_MESSAGE_BYTES", "2000"))
+# Messages replayed to a client on join
+WATCHPARTY_CHAT_REPLAY = int(os.environ.get("WATCHPARTY_CHAT_REPLAY", "50"))
+# Seconds an idle room's chat history is kept
+WATCHPARTY_CHAT_TTL = int(os.environ.get("WATCHPARTY_CHAT_TTL", "86400"))
+
+# Periodic maintenance (run by celery beat)
+MAINTENANCE_INTERVAL = int(os.environ.get("MAINTENANCE_INTERVAL", "900"))
+# Rows deleted per statement, to keep locks short
+MAINTENANCE_BATCH_SIZE = int(os.environ.get("MAINTENANCE_BATCH_SIZE", "500"))
+# Seconds without host activity before an empty room is deleted
+WATCHPARTY_ROOM_IDLE_TTL = int(os.environ.get("WATCHPARTY_ROOM_IDLE_TTL", "21600"))
+# Seconds a job may sit in an intermediate status before it is considered dead
+JOB_STALE_AFTER = int(os.environ.get("JOB_STALE_AFTER", "21600"))
+
+# process_video acks late, so a worker reserves only the jobs it is running and
+# jobs lost with a worker are redelivered once the visibility timeout passes;
+# keep that above the longest job
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "visibility_timeout": int(os.environ.get("CELERY_VISIBILITY_TIMEOUT", str(JOB_STALE_AFTER))),
+}
+
+CELERY_BEAT_SCHEDULE = {
+    "reap-abandoned-rooms": {
+        "task": "watchparty.tasks.reap_abandoned_rooms",
+        "schedule": MAINTENANCE_INTERVAL,
+    },
+    "reap-stale-jobs": {
+        "task": "summarizer.tasks.reap_stale_jobs",
+        "schedule": MAINTENANCE_INTERVAL,
+    },
+}
+
+# Shared (Redis) token buckets for upstream APIs, enforced by the Celery tasks
+RATE_LIMIT_REDIS_URL = REDIS_URL or "redis://redis:6379/0"
+UPSTREAM_RATE_LIMITS = {
+    "openai": {
+        "requests_per_minute": int(os.environ.get("OPENAI_REQUESTS_PER_MINUTE", "500")),
+        "tokens_per_minute": int(os.environ.get("OPENAI_TOKENS_PER_MINUTE", "200000")),
+    },
+    "whisper": {
+        "requests_per_minute": int(os.environ.get("WHISPER_REQUESTS_PER_MINUTE", "10")),
+    },
+}
+
+# Admission control for new jobs: reply 429 once this many jobs are in flight
+JOB_QUEUE_MAX_BACKLOG = int(os.environ.get("JOB_QUEUE_MAX_BACKLOG", "50"))
+# Jobs processed concurrently across the worker fleet, for queue ETAs
+JOB_QUEUE_PARALLELISM = int(os.environ.get("JOB_QUEUE_PARALLELISM", "1"))
+# Assumed seconds per job until there is history to average
+JOB_DEFAULT_SECONDS = int(os.environ.get("JOB_DEFAULT_SECONDS", "180"))
+
+# Asyncio pipeline mode: each Celery worker process overlaps the network waits of
+# many jobs on an event loop instead of blocking one process per job. Run it with
+# a thread pool (celery worker -P threads -c PIPELINE_ASYNC_MAX_JOBS): each task
+# thread waits on its job, so concurrency caps the jobs taken off the broker.
+PIPELINE_ASYNC = os.environ.get("PIPELINE_ASYNC", "False").lower() in ("true", "1", "yes")
+# Jobs in flight per worker process, and per-stage concurrency within that
+PIPELINE_ASYNC_MAX_JOBS = int(os.environ.get("PIPELINE_ASYNC_MAX_JOBS", "200"))
+PIPELINE_ASYNC_DOWNLOADS = int(os.environ.get("PIPELINE_ASYNC_DOWNLOADS", "8"))
+PIPELINE_ASYNC_TRANSCRIPTIONS = int(os.environ.get("PIPELINE_ASYNC_TRANSCRIPTIONS", "4"))
+PIPELINE_ASYNC_ANALYSES = int(os.environ.get("PIPELINE_ASYNC_ANALYSES", "32"))
+# Processes for yt-dlp downloads and ffmpeg conversion
+PIPELINE_ASYNC_CPU_WORKERS = int(os.environ.get("PIPELINE_ASYNC_CPU_WORKERS", str(os.cpu_count() or 1)))
+
+# Captions fast path: build the transcript from the video's own subtitles
+# when they cover enough of it, skipping the audio download and Whisper
+PIPELINE_FORCE_WHISPER = os.environ.get("PIPELINE_FORCE_WHISPER", "False").lower() in ("true", "1", "yes")
+# Subtitle languages to look for, in order, after the video's own language
+CAPTIONS_LANGUAGES = os.environ.get("CAPTIONS_LANGUAGES", "en").split(",")
+# Whether auto-generated captions may be used when there are no uploaded ones
+CAPTIONS_ALLOW_AUTOMATIC = os.environ.get("CAPTIONS_ALLOW_AUTOMATIC", "True").lower() in ("true", "1", "yes")
+# Fraction of the video's duration the captions must span to be trusted
+CAPTIONS_MIN_COVERAGE = float(os.environ.get("CAPTIONS_MIN_COVERAGE", "0.6"))
 
 # Tailscale Transcription Service URL
 # Set this to your local machine's Tailscale IP, e.g., "http://100.x.x.x:8080"
@@ -16,10 +16,9 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include, re_path
-from django.http import JsonResponse, HttpResponse
-from django.views.static import serve
-from django.conf import settings
-import os
+from django.http import JsonResponse
+from .db import executor_stats, pool_stats
+from .frontend import serve_frontend
 
 
 def health_check(request):
@@ -27,18 +26,15 @@ def health_check(request):
     return JsonResponse({"status": "ok"})
 
 
-def serve_frontend(request):
-    """Serve the React frontend for all non-API routes."""
-    index_path = os.path.join(settings.STATIC_ROOT, "index.html")
-    if os.path.exists(index_path):
-        with open(index_path, "r") as f:
-            return HttpResponse(f.read(), content_type="text/html")
-    return HttpResponse("Frontend not found", status=404)
+def db_stats(request):
+    """Connection pool and consumer DB thread usage in this server process."""
+    return JsonResponse({"pool": pool_stats(), "executor": executor_stats()})
 
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/health/", health_check),
+    path("api/health/db/", db_stats),
     path("api/v1/summarizer/", include("summarizer.api_urls")),
     path("api/v1/watchparty/", include("watchparty.api_urls")),
 ]
@@ -0,0 +1,47 @@
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Job
+
+# Completed jobs whose stage timings feed the ETA estimate
+HISTORY_SIZE = 50
+
+
+def backlog_size():
+    """Jobs queued or in flight. Failed jobs and ones stuck past JOB_STALE_AFTER don't count."""
+    live_since = timezone.now() - timedelta(seconds=settings.JOB_STALE_AFTER)
+    return (
+        Job.objects.exclude(status__in=[Job.Status.completed, Job.Status.failed])
+        .filter(updated_at__gte=live_since)
+        .count()
+    )
+
+
+def average_job_seconds():
+    """Mean end-to-end pipeline time over recent completed jobs."""
+    recent = (
+        Job.objects.filter(status=Job.Status.completed, stage_durations__isnull=False)
+        .order_by("-updated_at")
+        .values_list("stage_durations", flat=True)[:HISTORY_SIZE]
+    )
+    totals = [sum(durations.values()) for durations in recent if durations]
+    if not totals:
+        return settings.JOB_DEFAULT_SECONDS
+    return sum(totals) / len(totals)
+
+
+def queue_estimate(backlog):
+    """
+    Queue position a new job would get and its ETA, plus how long until the
+    backlog drains under JOB_QUEUE_MAX_BACKLOG (the Retry-After), in seconds.
+    """
+    per_job = average_job_seconds()
+    parallelism = settings.JOB_QUEUE_PARALLELISM
+    position = backlog + 1
+    eta = math.ceil(position / parallelism) * per_job
+    excess = backlog - settings.JOB_QUEUE_MAX_BACKLOG + 1
+    retry_after = max(1, math.ceil(math.ceil(excess / parallelism) * per_job))
+    return position, math.ceil(eta), retry_after
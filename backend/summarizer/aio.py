@@ -0,0 +1,179 @@
+"""
+Asyncio execution mode for the video pipeline (``PIPELINE_ASYNC``).
+
+Downloads, Whisper uploads and LLM calls are network waits, so instead of
+tying up a whole prefork process per job, each worker process runs an event
+loop in a background thread and multiplexes many jobs over it, bounded by
+per-stage semaphores. Each job's Celery task waits on it from a task thread,
+which keeps broker backpressure and redelivery working. yt-dlp downloading and the ffmpeg conversion stay off
+the loop in a process pool.
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import httpx
+from asgiref.sync import sync_to_async
+from channels.db import aclose_old_connections
+from django.conf import settings
+from openai import AsyncOpenAI, RateLimitError
+
+from . import captions, ratelimit, transcripts
+from .models import Job
+from .tasks import (
+    ANALYSIS_COMPLETION_TOKENS,
+    ANALYSIS_MODEL,
+    WHISPER_PARAMS,
+    apply_analysis,
+    build_analysis_prompt,
+    fetch_audio,
+    mark_failed,
+    record_stage,
+    retry_delay,
+    upstream_retry_after,
+    whisper_endpoint,
+)
+
+logger = logging.getLogger(__name__)
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+class Pipeline:
+    """An event loop thread plus the clients and limits its jobs share."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="pipeline-aio", daemon=True
+        )
+        # Celery's prefork children are daemonic and can't start worker
+        # processes of their own; fall back to threads there (ffmpeg still
+        # runs as its own process). Use -P solo to get a real process pool.
+        workers = settings.PIPELINE_ASYNC_CPU_WORKERS
+        if multiprocessing.current_process().daemon:
+            self.cpu_pool = ThreadPoolExecutor(workers)
+        else:
+            self.cpu_pool = ProcessPoolExecutor(workers)
+
+        self.jobs = asyncio.Semaphore(settings.PIPELINE_ASYNC_MAX_JOBS)
+        self.downloads = asyncio.Semaphore(settings.PIPELINE_ASYNC_DOWNLOADS)
+        self.transcriptions = asyncio.Semaphore(settings.PIPELINE_ASYNC_TRANSCRIPTIONS)
+        self.analyses = asyncio.Semaphore(settings.PIPELINE_ASYNC_ANALYSES)
+
+        self.asr_url, proxy = whisper_endpoint()
+        # Uploads of long videos take as long as Whisper does; no timeout,
+        # matching the blocking pipeline
+        self.http = httpx.AsyncClient(proxy=proxy, timeout=None)
+        self.openai = AsyncOpenAI()
+
+        self.thread.start()
+
+    async def process(self, job_id):
+        async with self.jobs:
+            # The ORM's thread keeps a persistent connection; health-check it
+            await aclose_old_connections()
+            try:
+                await self.run(job_id)
+            except Exception:
+                logger.exception("Async pipeline failed for job %s", job_id)
+                await sync_to_async(mark_failed)(job_id)
+
+    async def run(self, job_id):
+        job = await Job.objects.aget(id=job_id)
+
+        if not job.transcript and not (job.audio_path and os.path.exists(job.audio_path)):
+            job.status = "DOWNLOADING"
+            await job.asave()
+            started = time.monotonic()
+            async with self.downloads:
+                # Metadata first: videos with usable captions skip download and Whisper
+                probe = await self.loop.run_in_executor(self.cpu_pool, captions.probe, job.url)
+                transcript = captions.apply_probe(job, probe)
+                if transcript is None:
+                    job.audio_path = await self.loop.run_in_executor(
+                        self.cpu_pool, fetch_audio, job.url
+                    )
+            record_stage(job, "DOWNLOADING", started)
+            await job.asave()
+            if transcript is not None:
+                await sync_to_async(transcripts.save_segments)(job, transcript)
+
+        if not job.transcript:
+            await self.wait_for_capacity("whisper")
+            job.status = "TRANSCRIBING"
+            await job.asave()
+            started = time.monotonic()
+            async with self.transcriptions:
+                transcript = await self.transcribe(job.audio_path)
+            job.transcript = json.dumps(transcript)
+            job.audio_path = None
+            record_stage(job, "TRANSCRIBING", started)
+            await job.asave()
+            await sync_to_async(transcripts.save_segments)(job, transcript)
+
+        transcript = json.loads(job.transcript)
+        await self.wait_for_capacity(
+            "openai",
+            ratelimit.estimate_tokens(job.transcript, ANALYSIS_COMPLETION_TOKENS),
+        )
+        job.status = "ANALYZING"
+        await job.asave()
+        started = time.monotonic()
+        async with self.analyses:
+            raw_content = await self.analyze(transcript, job.source_chapters)
+
+        apply_analysis(job, raw_content)
+        record_stage(job, "ANALYZING", started)
+        job.status = "COMPLETED"
+        await job.asave()
+
+    async def wait_for_capacity(self, upstream, tokens=0):
+        """Sleep until the shared rate limiter grants a call to ``upstream``."""
+        while wait := await asyncio.to_thread(ratelimit.acquire, upstream, tokens):
+            await asyncio.sleep(retry_delay(wait))
+
+    async def transcribe(self, path):
+        while True:
+            with open(path, "rb") as audio_file:
+                response = await self.http.post(
+                    self.asr_url, files={"audio_file": audio_file}, params=WHISPER_PARAMS
+                )
+            if response.status_code != 429:
+                break
+            await asyncio.sleep(retry_delay(upstream_retry_after(response.headers)))
+
+        response.raise_for_status()
+        if os.path.exists(path):
+            os.remove(path)
+        return response.json()
+
+    async def analyze(self, transcript, chapters=None):
+        while True:
+            try:
+                response = await self.openai.chat.completions.create(
+                    model=ANALYSIS_MODEL,
+                    messages=[
+                        {"role": "user", "content": build_analysis_prompt(transcript, chapters)}
+                    ],
+                    response_format={"type": "json_object"},
+                )
+                return response.choices[0].message.content
+            except RateLimitError as e:
+                await asyncio.sleep(retry_delay(upstream_retry_after(e.response.headers)))
+
+
+def submit(job_id):
+    """Schedule a job on this process's pipeline loop; returns a future for it."""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = Pipeline()
+    return asyncio.run_coroutine_threadsafe(_pipeline.process(job_id), _pipeline.loop)
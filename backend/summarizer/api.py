@@ -1,8 +1,15 @@
+import math
 from rest_framework import generics, status
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from streamsmart import celery_app
+from streamsmart.frontend import choose_encoding
+from . import transcripts
+from .admission import backlog_size, queue_estimate
 from .serializers import JobSerializer
 from .models import Job
-from .tasks import process_video
 from django.db import transaction
 
 class JobRetrieve(generics.RetrieveAPIView):
@@ -21,9 +28,79 @@ class JobCreate(generics.CreateAPIView):
             if existing_job:
                 serializer = self.get_serializer(existing_job)
                 return Response(serializer.data, status=status.HTTP_200_OK)
+
+        # Admission control: shed new work once the backlog is too deep
+        backlog = backlog_size()
+        if backlog >= settings.JOB_QUEUE_MAX_BACKLOG:
+            position, eta, retry_after = queue_estimate(backlog)
+            return Response(
+                {
+                    "error": "Too many videos are being processed. Please try again later.",
+                    "queue_position": position,
+                    "eta_seconds": eta,
+                },
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(retry_after)},
+            )
         return super().create(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         instance = serializer.save()
-        transaction.on_commit(lambda: process_video.delay(instance.id))
-        
\ No newline at end of file
+        # Enqueue by name so the web tier doesn't import the pipeline's dependencies
+        transaction.on_commit(
+            lambda: celery_app.send_task("summarizer.tasks.process_video", args=[instance.id])
+        )
+
+
+class TranscriptExport(APIView):
+    """
+    Stream a job's transcript as SRT, WebVTT or NDJSON. ``start`` and ``end``
+    (seconds) limit it to the segments overlapping that window, so players
+    can fetch captions incrementally.
+    """
+
+    @staticmethod
+    def seconds_param(request, name):
+        value = request.query_params.get(name)
+        if not value:
+            return None
+        seconds = float(value)
+        if not math.isfinite(seconds):
+            raise ValueError(f"{name} must be finite")
+        return seconds
+
+    def get(self, request, pk, export_format):
+        if export_format not in transcripts.CONTENT_TYPES:
+            return Response(
+                {"error": "Format must be one of srt, vtt, ndjson"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        try:
+            job = Job.objects.get(pk=pk)
+        except Job.DoesNotExist:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            start = self.seconds_param(request, "start")
+            end = self.seconds_param(request, "end")
+        except ValueError:
+            return Response(
+                {"error": "start and end must be numbers of seconds"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not transcripts.ensure_segments(job):
+            return Response(
+                {"error": "Transcript not available yet"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        gzip = choose_encoding(request.headers.get("Accept-Encoding", ""), {"gzip"}) == "gzip"
+        response = StreamingHttpResponse(
+            transcripts.export(job.id, export_format, start, end, gzip=gzip),
+            content_type=transcripts.CONTENT_TYPES[export_format],
+        )
+        if gzip:
+            response["Content-Encoding"] = "gzip"
+        response["Vary"] = "Accept-Encoding"
+        response["Content-Disposition"] = f'inline; filename="transcript-{job.id}.{export_format}"'
+        return response
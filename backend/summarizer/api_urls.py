@@ -4,4 +4,9 @@ from . import api
 urlpatterns = [
     path('summarize/', api.JobCreate.as_view(), name='create_job' ),
     path('jobs/<int:pk>', api.JobRetrieve.as_view(), name='get_job'),
+    path(
+        'jobs/<int:pk>/transcript.<str:export_format>',
+        api.TranscriptExport.as_view(),
+        name='export_transcript',
+    ),
 ]
\ No newline at end of file
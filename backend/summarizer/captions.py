@@ -0,0 +1,183 @@
+"""
+Fast path for videos whose source already provides subtitles: a metadata
+only extraction fills in the job's title, duration and uploader chapters,
+and when a caption track covers enough of the video the transcript is built
+from it, skipping the audio download and Whisper entirely.
+"""
+
+import json
+import logging
+import re
+
+from django.conf import settings
+from yt_dlp.utils import YoutubeDLError
+
+from . import clients
+
+logger = logging.getLogger(__name__)
+
+# Caption formats we can parse, most precise first
+CAPTION_FORMATS = ("json3", "vtt")
+
+VTT_TIMING = re.compile(r"((?:\d+:)?\d{2}:\d{2}\.\d{3})\s+-->\s+((?:\d+:)?\d{2}:\d{2}\.\d{3})")
+VTT_TAG = re.compile(r"<[^>]+>")
+
+
+def probe(url):
+    """
+    Metadata-only look at a video: no download and no format selection.
+    Returns its title, duration, uploader chapters, and a transcript from its
+    captions, or None for the transcript when Whisper is needed. Plain data
+    so the async pipeline can run it in a process pool.
+    """
+    info = clients.youtube_dl().extract_info(url, download=False, process=False)
+    duration = info.get("duration")
+    return {
+        "title": info.get("title"),
+        "duration": round(duration) if duration else None,
+        "chapters": chapters_from(info),
+        "transcript": None if settings.PIPELINE_FORCE_WHISPER else transcript_from(info),
+    }
+
+
+def apply_probe(job, result):
+    """Copy a probe result onto the job; returns the captions transcript, if any."""
+    job.title = result["title"] or job.title
+    job.duration = result["duration"] or job.duration
+    job.source_chapters = result["chapters"]
+    transcript = result["transcript"]
+    if transcript is not None:
+        job.transcript = json.dumps(transcript)
+    return transcript
+
+
+def chapters_from(info):
+    chapters = [
+        {"timestamp": chapter["start_time"], "title": chapter.get("title") or ""}
+        for chapter in info.get("chapters") or []
+        if chapter.get("start_time") is not None
+    ]
+    return chapters or None
+
+
+def pick_track(info):
+    """
+    The best parseable caption track as (kind, language, format). Uploaded
+    subtitles win over automatic captions; automatic ones are only taken in
+    the video's own language, since others are machine translations.
+    """
+    preferred = settings.CAPTIONS_LANGUAGES
+    language = info.get("language")
+    sources = [("subtitles", [language, *preferred] if language else preferred)]
+    if settings.CAPTIONS_ALLOW_AUTOMATIC:
+        sources.append(("automatic_captions", [language] if language else preferred))
+
+    for kind, languages in sources:
+        tracks = info.get(kind) or {}
+        for wanted in languages:
+            # Regional variants too (en-US, en-GB), and YouTube's "en-orig"
+            for code, formats in tracks.items():
+                if code != wanted and not code.startswith(f"{wanted}-"):
+                    continue
+                for ext in CAPTION_FORMATS:
+                    for fmt in formats:
+                        if fmt.get("ext") == ext and fmt.get("url"):
+                            return kind, code, fmt
+    return None
+
+
+def parse_json3(raw):
+    """Segments from YouTube's json3 timed text."""
+    segments = []
+    for event in json.loads(raw).get("events", []):
+        text = "".join(seg.get("utf8", "") for seg in event.get("segs") or [])
+        text = " ".join(text.split())
+        if not text:
+            continue
+        start = event["tStartMs"] / 1000
+        segments.append(
+            {"start": start, "end": start + event.get("dDurationMs", 0) / 1000, "text": text}
+        )
+    return segments
+
+
+def vtt_seconds(timestamp):
+    seconds = 0.0
+    for part in timestamp.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def parse_vtt(raw):
+    """
+    Segments from WebVTT. Automatic captions repeat the previous cue's line
+    as they roll, so lines already shown by the previous cue are dropped.
+    """
+    segments, previous = [], []
+    for block in re.split(r"\n\s*\n", raw.replace("\r\n", "\n")):
+        lines = block.strip().split("\n")
+        for i, line in enumerate(lines):
+            timing = VTT_TIMING.search(line)
+            if timing:
+                break
+        else:
+            continue
+        cue = [" ".join(VTT_TAG.sub("", text).split()) for text in lines[i + 1:]]
+        cue = [text for text in cue if text]
+        new = [text for text in cue if text not in previous]
+        previous = cue
+        if new:
+            segments.append({
+                "start": vtt_seconds(timing.group(1)),
+                "end": vtt_seconds(timing.group(2)),
+                "text": " ".join(new),
+            })
+    return segments
+
+
+PARSERS = {"json3": parse_json3, "vtt": parse_vtt}
+
+
+def coverage(segments, duration):
+    """Fraction of ``duration`` seconds spanned by at least one segment."""
+    covered = reached = 0.0
+    for segment in sorted(segments, key=lambda s: s["start"]):
+        start = max(segment["start"], reached)
+        if segment["end"] > start:
+            covered += segment["end"] - start
+            reached = segment["end"]
+    return min(1.0, covered / duration)
+
+
+def transcript_from(info):
+    """
+    A Whisper-shaped transcript ({"text", "segments", "language"}) from the
+    video's captions, or None if it has none or they cover less than
+    CAPTIONS_MIN_COVERAGE of the video.
+    """
+    track = pick_track(info)
+    if track is None:
+        return None
+    kind, language, fmt = track
+
+    try:
+        with clients.youtube_dl().urlopen(fmt["url"]) as response:
+            raw = response.read().decode("utf-8")
+        segments = PARSERS[fmt["ext"]](raw)
+    except (YoutubeDLError, OSError, ValueError, KeyError) as e:
+        logger.warning("Could not use %s %s for %s: %s", kind, language, info.get("id"), e)
+        return None
+
+    duration = info.get("duration")
+    if not segments or (
+        duration and coverage(segments, duration) < settings.CAPTIONS_MIN_COVERAGE
+    ):
+        logger.info("Captions for %s too sparse, falling back to Whisper", info.get("id"))
+        return None
+
+    return {
+        "text": " ".join(segment["text"] for segment in segments),
+        "segments": [{"id": i, **segment} for i, segment in enumerate(segments)],
+        "language": language,
+        "source": kind,
+    }
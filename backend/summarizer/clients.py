@@ -0,0 +1,71 @@
+"""
+Long-lived upstream clients for the pipeline, built once per worker process
+(warmed on ``worker_process_init``) rather than on every task.
+
+Only Celery workers import this, through ``tasks``; the web tier enqueues
+tasks by name and never loads yt-dlp, openai or requests.
+"""
+
+import logging
+import threading
+
+import requests
+import yt_dlp
+from openai import OpenAI, OpenAIError
+
+logger = logging.getLogger(__name__)
+
+# Downloaded audio lands here (relative to the worker's CWD) until transcribed
+AUDIO_DIR = 'audio'
+
+YDL_OPTS = {
+    'format': 'bestaudio/best',
+    'postprocessors': [{
+        'key': 'FFmpegExtractAudio',
+        'preferredcodec': 'mp3',
+        'preferredquality': '192',
+    }],
+    'outtmpl': f'{AUDIO_DIR}/%(title)s.%(ext)s',
+    'noplaylist': True,
+}
+
+_openai = None
+_openai_lock = threading.Lock()
+# YoutubeDL and requests sessions aren't thread-safe; the async pipeline's
+# download pool may run several, so those are kept per thread
+_local = threading.local()
+
+
+def openai_client():
+    global _openai
+    with _openai_lock:
+        if _openai is None:
+            _openai = OpenAI()
+    return _openai
+
+
+def youtube_dl():
+    if getattr(_local, "ydl", None) is None:
+        _local.ydl = yt_dlp.YoutubeDL(YDL_OPTS)
+    return _local.ydl
+
+
+def whisper_session(proxy=None):
+    """A keep-alive session for the Whisper service, optionally via a proxy."""
+    if getattr(_local, "whisper", None) is None:
+        session = requests.Session()
+        if proxy:
+            session.proxies = {"http": proxy, "https": proxy}
+        _local.whisper = session
+    return _local.whisper
+
+
+def warm(proxy=None):
+    """Build this process's clients up front so the first task doesn't pay for it."""
+    try:
+        openai_client()
+    except OpenAIError as e:
+        # e.g. no API key yet; let the analysis task report it
+        logger.warning("OpenAI client not initialised: %s", e)
+    youtube_dl()
+    whisper_session(proxy)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0003_job_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='stage_durations',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0004_job_stage_durations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('start', models.FloatField()),
+                ('end', models.FloatField()),
+                ('text', models.TextField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='summarizer.job')),
+            ],
+            options={
+                'ordering': ['index'],
+                'indexes': [models.Index(fields=['job', 'start'], name='summarizer__job_id_b6ca1c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('job', 'index'), name='unique_segment_index')],
+            },
+        ),
+    ]
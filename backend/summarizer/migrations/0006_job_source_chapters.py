@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0005_transcript_segments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='source_chapters',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
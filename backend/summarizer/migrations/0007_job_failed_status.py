@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0006_job_source_chapters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='status',
+            field=models.CharField(choices=[('DOWNLOADING', 'Downloading'), ('TRANSCRIBING', 'Transcribing'), ('ANALYZING', 'Analyzing'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='DOWNLOADING', max_length=20),
+        ),
+    ]
@@ -6,6 +6,8 @@ class Job(models.Model):
         transcribing = "TRANSCRIBING"
         analyzing = "ANALYZING"
         completed = "COMPLETED"
+        # Terminal: the pipeline raised (bad URL, upstream error, ...)
+        failed = "FAILED"
 
     url = models.TextField(blank=False)
     status = models.CharField(
@@ -18,3 +20,28 @@ class Job(models.Model):
     summary = models.TextField(blank=True, null=True)
     chapters = models.JSONField(blank=True, null=True)
     highlights = models.JSONField(blank=True, null=True)
+    # Chapters defined by the uploader, given to the LLM as anchors
+    source_chapters = models.JSONField(blank=True, null=True)
+    # Seconds spent in each pipeline stage, keyed by status
+    stage_durations = models.JSONField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every save, so jobs stuck mid-pipeline stop advancing it
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+
+class TranscriptSegment(models.Model):
+    """One timed line of a job's transcript; exports stream these in order."""
+
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name="segments")
+    index = models.PositiveIntegerField()
+    start = models.FloatField()
+    end = models.FloatField()
+    text = models.TextField()
+
+    class Meta:
+        ordering = ["index"]
+        constraints = [
+            models.UniqueConstraint(fields=["job", "index"], name="unique_segment_index"),
+        ]
+        # Time-window exports look segments up by where they start
+        indexes = [models.Index(fields=["job", "start"])]
@@ -0,0 +1,76 @@
+import redis
+from django.conf import settings
+
+# Shared token buckets for upstream APIs, so limits hold across the whole
+# Celery fleet rather than per worker.
+#
+# All of an upstream's buckets (requests/minute, tokens/minute) are checked
+# and charged atomically: either every bucket has room and all are debited,
+# or nothing is debited and the longest wait is returned. Redis TIME is used
+# so worker clock skew doesn't matter. A cost larger than a bucket's capacity
+# is clamped to it, so oversized calls wait for a full bucket instead of
+# forever. KEYS: bucket keys. ARGV: (capacity, refill per second, cost) per key.
+ACQUIRE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local wait = 0
+local levels = {}
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 3 - 2])
+    local rate = tonumber(ARGV[i * 3 - 1])
+    local cost = math.min(tonumber(ARGV[i * 3]), capacity)
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens - cost
+    if tokens < cost then
+        wait = math.max(wait, (cost - tokens) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 3 - 2])
+    local rate = tonumber(ARGV[i * 3 - 1])
+    redis.call('HSET', key, 'tokens', tostring(levels[i]), 'ts', tostring(now))
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return '0'
+"""
+
+_client = None
+
+
+def get_redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.RATE_LIMIT_REDIS_URL)
+    return _client
+
+
+def acquire(upstream, tokens=0):
+    """
+    Take one request, plus ``tokens`` model tokens where the upstream has a
+    token budget, from the upstream's shared buckets. Returns 0 if granted,
+    otherwise the seconds to wait before trying again.
+    """
+    limits = settings.UPSTREAM_RATE_LIMITS.get(upstream, {})
+    keys, args = [], []
+    for name, cost in (("requests_per_minute", 1), ("tokens_per_minute", tokens)):
+        per_minute = limits.get(name)
+        if not per_minute:
+            continue
+        keys.append(f"ratelimit:{upstream}:{name}")
+        args += [per_minute, per_minute / 60, cost]
+
+    if not keys:
+        return 0
+    script = get_redis().register_script(ACQUIRE_SCRIPT)
+    return float(script(keys=keys, args=args))
+
+
+def estimate_tokens(text, completion_budget=0):
+    """Rough token count for budgeting (~4 characters per token)."""
+    return len(text) // 4 + completion_budget
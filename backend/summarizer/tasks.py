@@ -1,78 +1,172 @@
 from celery import shared_task
+from celery.exceptions import Retry
+from celery.signals import worker_process_init
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from . import captions, clients, ratelimit, transcripts
+from .clients import AUDIO_DIR
 from .models import Job
-import yt_dlp
 import os
-from openai import OpenAI
+import random
+import time
+from openai import RateLimitError
 import requests
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
-@shared_task
-def process_video(job_id: int):
+# Completion tokens reserved per analysis when charging the OpenAI token budget
+ANALYSIS_COMPLETION_TOKENS = 2000
+
+
+@worker_process_init.connect
+def warm_clients(**kwargs):
+    # Prefork children only; with -P solo/threads they're built on first use
+    clients.warm(proxy=whisper_endpoint()[1])
+
+
+def retry_delay(wait):
+    # Jitter so jobs deferred together don't all come back at the same instant
+    return wait + random.uniform(0, 1)
 
+
+def record_stage(job, stage, started):
+    """Store how long a stage took; feeds the queue ETA in admission control."""
+    job.stage_durations = {
+        **(job.stage_durations or {}),
+        stage: round(time.monotonic() - started, 2),
+    }
+
+
+@shared_task(bind=True, max_retries=None, acks_late=True)
+def process_video(self, job_id: int):
+    """
+    Run the pipeline for a job. Progress (audio on disk, transcript) is saved
+    on the job, so when an upstream is rate limited the task is retried later
+    and resumes at the stage that was deferred. Acked only once it finishes,
+    so a job cut off by a worker crash is redelivered and resumes the same way.
+    """
+    if settings.PIPELINE_ASYNC:
+        # Run the job on this worker process's event loop and wait for it, so
+        # the worker only takes as many jobs off the broker as it has task
+        # threads (-P threads -c N) and in-flight jobs stay unacked
+        from . import aio
+        aio.submit(job_id).result()
+        return
+
+    try:
+        run_pipeline(self, job_id)
+    except Retry:
+        raise
+    except Exception:
+        mark_failed(job_id)
+        raise
+
+
+def mark_failed(job_id):
+    """Terminal status for a job whose pipeline raised, so it stops counting as backlog."""
+    Job.objects.filter(id=job_id).update(status=Job.Status.failed, updated_at=timezone.now())
+
+
+def run_pipeline(task, job_id):
+    """process_video's blocking pipeline; defers a stage by raising task.retry()."""
     job = Job.objects.get(id = job_id)
 
-    job.status = "DOWNLOADING"
-    job.save()
-    audio_file_path = download_audio(job.url)
+    if not job.transcript and not (job.audio_path and os.path.exists(job.audio_path)):
+        job.status = "DOWNLOADING"
+        job.save()
+        started = time.monotonic()
+        # Metadata first: videos with usable captions skip download and Whisper
+        transcript = captions.apply_probe(job, captions.probe(job.url))
+        if transcript is None:
+            # Recorded so the maintenance reaper can clean up if the pipeline dies
+            job.audio_path = download_audio(job.url)
+        record_stage(job, "DOWNLOADING", started)
+        job.save()
+        if transcript is not None:
+            transcripts.save_segments(job, transcript)
 
-    job.status = "TRANSCRIBING"
-    job.save()
-    transcript = transcribe_audio(audio_file_path)
+    if not job.transcript:
+        wait = ratelimit.acquire("whisper")
+        if wait:
+            raise task.retry(countdown=retry_delay(wait))
+
+        job.status = "TRANSCRIBING"
+        job.save()
+        started = time.monotonic()
+        try:
+            transcript = transcribe_audio(job.audio_path)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 429:
+                raise
+            raise task.retry(countdown=retry_delay(upstream_retry_after(e.response.headers)))
+        job.transcript = json.dumps(transcript)
+        job.audio_path = None
+        record_stage(job, "TRANSCRIBING", started)
+        job.save()
+        transcripts.save_segments(job, transcript)
+
+    transcript = json.loads(job.transcript)
+    wait = ratelimit.acquire(
+        "openai",
+        tokens=ratelimit.estimate_tokens(job.transcript, ANALYSIS_COMPLETION_TOKENS),
+    )
+    if wait:
+        raise task.retry(countdown=retry_delay(wait))
 
     job.status = "ANALYZING"
     job.save()
-    analysis = llm_analysis(transcript)
+    started = time.monotonic()
+    try:
+        analysis = llm_analysis(transcript, job.source_chapters)
+    except RateLimitError as e:
+        raise task.retry(countdown=retry_delay(upstream_retry_after(e.response.headers)))
 
-    raw_content = analysis.choices[0].message.content
-    data = json.loads(raw_content)
-    job.transcript = transcript
-    job.summary = data.get('summary')
-    job.chapters = data.get("chapters")
-    job.highlights = data.get("highlights")
+    apply_analysis(job, analysis.choices[0].message.content)
+    record_stage(job, "ANALYZING", started)
     job.status = "COMPLETED"
     job.save()
 
 
+def upstream_retry_after(headers, default=30):
+    """Seconds an upstream asked us to back off for after a 429."""
+    try:
+        return float(headers.get("Retry-After", default))
+    except (TypeError, ValueError):
+        return default
+
 
 @shared_task
 def download_audio(url: str):
+    return fetch_audio(url)
+
+
+def fetch_audio(url: str):
 
     """
     Downloads audio and returns the absolute path to the .mp3 file.
+    Plain function so the async pipeline can run it in a process pool.
     """
-    # Good practice: Use absolute paths for Celery tasks to avoid CWD confusion
-    output_dir = 'audio' 
-    
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-        }],
-        'outtmpl': f'{output_dir}/%(title)s.%(ext)s',
-        'noplaylist': True,
-    }
-
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            # 1. extract_info(download=True) downloads the video and returns the metadata dict
-            info = ydl.extract_info(url, download=True)
-            
-            # 2. prepare_filename generates the path based on the metadata and outtmpl
-            # Note: This usually returns the original extension (e.g., .webm or .m4a)
-            temp_path = ydl.prepare_filename(info)
-            
-            # 3. Update extension to match the postprocessor (mp3)
-            # Since FFmpegExtractAudio converts it, the final file on disk is .mp3
-            base, _ = os.path.splitext(temp_path)
-            final_path = f"{base}.mp3"
-            
-            # Return absolute path for reliability in other tasks
-            return os.path.abspath(final_path)
+        # Reused across tasks; options (audio only, mp3, AUDIO_DIR) live in clients
+        ydl = clients.youtube_dl()
+
+        # 1. extract_info(download=True) downloads the video and returns the metadata dict
+        info = ydl.extract_info(url, download=True)
+
+        # 2. prepare_filename generates the path based on the metadata and outtmpl
+        # Note: This usually returns the original extension (e.g., .webm or .m4a)
+        temp_path = ydl.prepare_filename(info)
+
+        # 3. Update extension to match the postprocessor (mp3)
+        # Since FFmpegExtractAudio converts it, the final file on disk is .mp3
+        base, _ = os.path.splitext(temp_path)
+        final_path = f"{base}.mp3"
+
+        # Return absolute path for reliability in other tasks
+        return os.path.abspath(final_path)
 
     except Exception as e:
         logger.error(f"Error downloading audio: {e}")
@@ -87,9 +181,8 @@ def transcribe_audio(path: str):
     
     return transcription
 
-@shared_task
-def process_chunk(path: str):
-
+def whisper_endpoint():
+    """Return the Whisper /asr URL and the proxy to reach it through, if any."""
     whisper_url = os.environ.get("WHISPER_API_URL", "")
 
     # Add http:// if no scheme provided
@@ -97,17 +190,25 @@ def process_chunk(path: str):
         whisper_url = f"http://{whisper_url}"
 
     # Use Tailscale SOCKS proxy if available (for reaching local network)
-    tailscale_proxy = os.environ.get("TAILSCALE_PROXY")
-    proxies = {"http": tailscale_proxy, "https": tailscale_proxy} if tailscale_proxy else None
+    return f"{whisper_url}/asr", os.environ.get("TAILSCALE_PROXY")
+
+
+# Query parameters for the Whisper container's /asr endpoint
+WHISPER_PARAMS = {"output": "json", "task": "transcribe"}
+
+
+@shared_task
+def process_chunk(path: str):
+
+    asr_url, tailscale_proxy = whisper_endpoint()
 
     # Local Whisper container (onerahmet/openai-whisper-asr-webservice)
     # Endpoint is /asr, file goes in multipart form data
     with open(path, "rb") as audio_file:
-        response = requests.post(
-            f"{whisper_url}/asr",
+        response = clients.whisper_session(tailscale_proxy).post(
+            asr_url,
             files={"audio_file": audio_file},
-            params={"output": "json", "task": "transcribe"},
-            proxies=proxies,
+            params=WHISPER_PARAMS,
         )
         response.raise_for_status()
         transcription = response.json()
@@ -116,14 +217,25 @@ def process_chunk(path: str):
         os.remove(path)
     return transcription
 
-@shared_task
-def llm_analysis(transcript: json):
-    ANALYSIS_PROMPT = f"""
+ANALYSIS_MODEL = "gpt-5-nano"
+
+
+def build_analysis_prompt(transcript, chapters=None):
+    anchors = ""
+    if chapters:
+        # Uploader-defined chapters are authoritative; the model only summarises them
+        anchors = f"""
+    The uploader already divided the video into these chapters. Use exactly
+    these timestamps and titles for the chapter breakdown:
+    {json.dumps(chapters)}
+    """
+    return f"""
     Analyze this video transcript and provide:
 
     1. A 2-3 paragraph summary of the main content
     2. Chapter breakdown with timestamps (use the [HH:MM:SS] markers in transcript)
     3. 3-5 highlight moments worth watching (use the [HH:MM:SS] markers in transcript)
+    {anchors}
 
     Respond in JSON format:
     {{
@@ -139,12 +251,25 @@ def llm_analysis(transcript: json):
     TRANSCRIPT:
     {transcript}
     """
+
+
+def apply_analysis(job, raw_content):
+    """Copy the LLM's JSON answer onto the job."""
+    data = json.loads(raw_content)
+    job.summary = data.get('summary')
+    job.chapters = data.get("chapters")
+    job.highlights = data.get("highlights")
+
+
+@shared_task
+def llm_analysis(transcript: json, chapters=None):
+    ANALYSIS_PROMPT = build_analysis_prompt(transcript, chapters)
     
-    client = OpenAI()
-    
+    client = clients.openai_client()
+
     # CHANGE: Use standard Chat Completions
     response = client.chat.completions.create(
-        model="gpt-5-nano", # Keep your preferred model
+        model=ANALYSIS_MODEL, # Keep your preferred model
         messages=[
             {"role": "user", "content": ANALYSIS_PROMPT}
         ],
@@ -152,3 +277,59 @@ def llm_analysis(transcript: json):
     )
     
     return response
+
+
+@shared_task
+def reap_stale_jobs():
+    """
+    Delete jobs stuck in an intermediate status past JOB_STALE_AFTER, in
+    bounded batches, along with their audio; then sweep orphaned audio files.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_STALE_AFTER)
+    stale = (
+        Job.objects.exclude(status__in=[Job.Status.completed, Job.Status.failed])
+        .filter(updated_at__lt=cutoff)
+        .order_by("updated_at")
+    )
+    jobs_deleted = files_deleted = bytes_freed = 0
+
+    def remove(path):
+        nonlocal files_deleted, bytes_freed
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        files_deleted += 1
+        bytes_freed += size
+
+    while True:
+        batch = list(stale.values_list("id", "audio_path")[: settings.MAINTENANCE_BATCH_SIZE])
+        if not batch:
+            break
+        for _, audio_path in batch:
+            if audio_path:
+                remove(audio_path)
+        # Count jobs only, not the transcript segments cascading with them
+        _, deleted = Job.objects.filter(
+            id__in=[job_id for job_id, _ in batch], updated_at__lt=cutoff
+        ).delete()
+        jobs_deleted += deleted.get("summarizer.Job", 0)
+
+    # Files left behind by downloads that crashed before the path was recorded
+    if os.path.isdir(AUDIO_DIR):
+        oldest_allowed = time.time() - settings.JOB_STALE_AFTER
+        with os.scandir(AUDIO_DIR) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < oldest_allowed:
+                    remove(entry.path)
+
+    logger.info(
+        "Reaped %d stale jobs and %d audio files (%d bytes)",
+        jobs_deleted, files_deleted, bytes_freed,
+    )
+    return {
+        "jobs_deleted": jobs_deleted,
+        "audio_files_deleted": files_deleted,
+        "audio_bytes_freed": bytes_freed,
+    }
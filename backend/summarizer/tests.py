@@ -1,3 +1,252 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+from unittest import mock
 
-# Create your tests here.
+import fakeredis
+from celery.exceptions import Retry
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from . import captions, ratelimit, tasks, transcripts
+from .admission import queue_estimate
+from .models import Job
+
+ROLLING_VTT = """WEBVTT
+Kind: captions
+Language: en
+
+00:00:00.000 --> 00:00:02.000 align:start position:0%
+hello<00:00:00.500><c> world</c>
+
+00:00:02.000 --> 00:00:04.000 align:start position:0%
+hello world
+how are <c>you</c>
+
+00:00:04.000 --> 00:00:06.000 align:start position:0%
+how are you
+"""
+
+
+class CaptionParsingTests(SimpleTestCase):
+    def test_vtt_drops_lines_repeated_by_rolling_captions(self):
+        segments = captions.parse_vtt(ROLLING_VTT)
+
+        self.assertEqual(
+            segments,
+            [
+                {"start": 0.0, "end": 2.0, "text": "hello world"},
+                {"start": 2.0, "end": 4.0, "text": "how are you"},
+            ],
+        )
+
+    def test_vtt_hour_timestamps(self):
+        segments = captions.parse_vtt("WEBVTT\n\n1:02:03.500 --> 1:02:05.000\nlate line\n")
+
+        self.assertEqual(segments, [{"start": 3723.5, "end": 3725.0, "text": "late line"}])
+
+    def test_json3_skips_empty_events(self):
+        raw = json.dumps({"events": [
+            {"tStartMs": 0, "dDurationMs": 1500, "segs": [{"utf8": "hi "}, {"utf8": "there"}]},
+            {"tStartMs": 1500, "dDurationMs": 10, "segs": [{"utf8": "\n"}]},
+            {"tStartMs": 2000},
+        ]})
+
+        self.assertEqual(
+            captions.parse_json3(raw), [{"start": 0.0, "end": 1.5, "text": "hi there"}]
+        )
+
+    def test_coverage_merges_overlapping_segments(self):
+        segments = [
+            {"start": 0, "end": 4, "text": "a"},
+            {"start": 2, "end": 6, "text": "b"},
+            {"start": 8, "end": 9, "text": "c"},
+        ]
+
+        self.assertAlmostEqual(captions.coverage(segments, 10), 0.7)
+
+
+@override_settings(
+    CAPTIONS_LANGUAGES=["en"], CAPTIONS_ALLOW_AUTOMATIC=True, CAPTIONS_MIN_COVERAGE=0.6
+)
+class CaptionTranscriptTests(SimpleTestCase):
+    def info(self, duration):
+        return {
+            "id": "abc",
+            "duration": duration,
+            "subtitles": {"en": [{"ext": "vtt", "url": "https://example.com/en.vtt"}]},
+        }
+
+    def transcript_from(self, info):
+        ydl = mock.Mock()
+        ydl.urlopen.return_value = io.BytesIO(ROLLING_VTT.encode())
+        with mock.patch.object(captions.clients, "youtube_dl", return_value=ydl):
+            return captions.transcript_from(info)
+
+    def test_used_when_coverage_meets_threshold(self):
+        transcript = self.transcript_from(self.info(duration=6))
+
+        self.assertEqual(transcript["text"], "hello world how are you")
+        self.assertEqual(transcript["source"], "subtitles")
+        self.assertEqual([s["id"] for s in transcript["segments"]], [0, 1])
+
+    def test_rejected_below_threshold(self):
+        # 4s of captions for a 60s video
+        self.assertIsNone(self.transcript_from(self.info(duration=60)))
+
+    def test_automatic_captions_only_in_video_language(self):
+        info = {
+            "language": "es",
+            "automatic_captions": {"en": [{"ext": "vtt", "url": "https://example.com/en"}]},
+        }
+
+        self.assertIsNone(captions.pick_track(info))
+
+
+async def collect(export_format, rows):
+    async def agen():
+        for row in rows:
+            yield row
+
+    return b"".join([chunk async for chunk in transcripts.render(export_format, agen())])
+
+
+class TranscriptExportTests(SimpleTestCase):
+    def test_timestamp_rounds_to_milliseconds(self):
+        self.assertEqual(transcripts.timestamp(3723.4567, ","), "01:02:03,457")
+        self.assertEqual(transcripts.timestamp(59.9996, "."), "00:01:00.000")
+
+    def test_srt(self):
+        body = asyncio.run(collect("srt", [(0, 0, 1.5, "one"), (1, 1.5, 3, "a <b> & c")]))
+
+        self.assertEqual(
+            body.decode(),
+            "1\n00:00:00,000 --> 00:00:01,500\none\n\n"
+            "2\n00:00:01,500 --> 00:00:03,000\na <b> & c\n\n",
+        )
+
+    def test_vtt_escapes_cue_text(self):
+        body = asyncio.run(collect("vtt", [(0, 0, 2, "x < y & y --> z")]))
+
+        self.assertEqual(
+            body.decode(),
+            "WEBVTT\n\n1\n00:00:00.000 --> 00:00:02.000\nx &lt; y &amp; y -> z\n\n",
+        )
+
+    def test_vtt_header_without_rows(self):
+        self.assertEqual(asyncio.run(collect("vtt", [])), b"WEBVTT\n\n")
+
+
+@override_settings(
+    UPSTREAM_RATE_LIMITS={"openai": {"requests_per_minute": 2, "tokens_per_minute": 600}}
+)
+class RateLimitTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(ratelimit, "_client", fakeredis.FakeRedis())
+        self.redis = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_waits_once_requests_run_out(self):
+        self.assertEqual(ratelimit.acquire("openai"), 0)
+        self.assertEqual(ratelimit.acquire("openai"), 0)
+
+        # Refilled at 2/60 per second, the next request is ~30s away
+        self.assertAlmostEqual(ratelimit.acquire("openai"), 30, delta=0.5)
+
+    def test_charges_no_bucket_unless_all_have_room(self):
+        self.assertEqual(ratelimit.acquire("openai", tokens=500), 0)
+
+        self.assertGreater(ratelimit.acquire("openai", tokens=500), 0)
+        # The refused call didn't spend the second request
+        self.assertEqual(ratelimit.acquire("openai", tokens=100), 0)
+
+    def test_cost_over_capacity_waits_for_a_full_bucket(self):
+        self.assertEqual(ratelimit.acquire("openai", tokens=60), 0)
+
+        # Clamped to the 600 token capacity: 60 tokens short at 10/s
+        self.assertAlmostEqual(ratelimit.acquire("openai", tokens=10_000), 6, delta=0.5)
+
+    def test_unlimited_upstream_is_not_checked(self):
+        self.assertEqual(ratelimit.acquire("whisper"), 0)
+        self.assertEqual(self.redis.keys(), [])
+
+
+@override_settings(
+    JOB_QUEUE_MAX_BACKLOG=4, JOB_QUEUE_PARALLELISM=2, JOB_DEFAULT_SECONDS=60
+)
+class AdmissionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_queue_estimate_at_threshold(self):
+        self.assertEqual(queue_estimate(4), (5, 180, 60))
+
+    def test_queue_estimate_above_threshold(self):
+        self.assertEqual(queue_estimate(7), (8, 240, 120))
+
+    def test_queue_estimate_uses_recent_job_times(self):
+        Job.objects.create(
+            url="https://example.com/done",
+            status=Job.Status.completed,
+            stage_durations={"DOWNLOADING": 5, "ANALYZING": 25},
+        )
+
+        self.assertEqual(queue_estimate(4), (5, 90, 30))
+
+    def test_rejects_new_jobs_over_backlog(self):
+        for i in range(4):
+            Job.objects.create(url=f"https://example.com/{i}")
+
+        response = self.client.post(
+            "/api/v1/summarizer/summarize/", {"url": "https://example.com/new"}
+        )
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "60")
+        self.assertEqual(response.data["queue_position"], 5)
+        self.assertEqual(response.data["eta_seconds"], 180)
+        self.assertFalse(Job.objects.filter(url="https://example.com/new").exists())
+
+    @mock.patch("summarizer.api.celery_app.send_task")
+    def test_failed_jobs_are_not_backlog(self, send_task):
+        for i in range(4):
+            Job.objects.create(url=f"https://example.com/{i}", status=Job.Status.failed)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/v1/summarizer/summarize/", {"url": "https://example.com/new"}
+            )
+
+        self.assertEqual(response.status_code, 201)
+        send_task.assert_called_once_with(
+            "summarizer.tasks.process_video", args=[response.data["id"]]
+        )
+
+
+class PipelineRateLimitTests(TestCase):
+    def setUp(self):
+        self.job = Job.objects.create(
+            url="https://example.com/v",
+            status=Job.Status.transcribing,
+            transcript=json.dumps({"text": "hello", "segments": []}),
+        )
+
+    @mock.patch.object(ratelimit, "acquire", return_value=12.0)
+    def test_empty_bucket_defers_the_job(self, acquire):
+        with mock.patch.object(tasks.process_video, "retry", side_effect=Retry()) as retry:
+            with self.assertRaises(Retry):
+                tasks.process_video(self.job.id)
+
+        acquire.assert_called_once_with("openai", tokens=mock.ANY)
+        self.assertGreaterEqual(retry.call_args.kwargs["countdown"], 12)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, Job.Status.transcribing)
+
+    @mock.patch.object(tasks, "llm_analysis", side_effect=ValueError("bad response"))
+    @mock.patch.object(ratelimit, "acquire", return_value=0)
+    def test_pipeline_error_marks_the_job_failed(self, acquire, llm_analysis):
+        with self.assertRaises(ValueError):
+            tasks.process_video(self.job.id)
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, Job.Status.failed)
@@ -0,0 +1,140 @@
+"""
+Transcripts stored as one row per timed segment, and exports that stream
+them as SRT, WebVTT or NDJSON a batch of rows at a time, so memory stays
+flat however long the video is.
+"""
+
+import ast
+import json
+import zlib
+
+from django.db import transaction
+
+from .models import TranscriptSegment
+
+# Segments read per query while exporting
+EXPORT_BATCH_SIZE = 500
+# Bytes of rendered output gathered before a chunk goes out
+EXPORT_CHUNK_BYTES = 16384
+
+CONTENT_TYPES = {
+    "srt": "application/x-subrip; charset=utf-8",
+    "vtt": "text/vtt; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def parse_transcript(raw):
+    """Decode a stored transcript: JSON, or the Python repr older jobs stored."""
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return ast.literal_eval(raw)
+
+
+def save_segments(job, transcript):
+    """Replace the job's segment rows with those of a Whisper-style transcript."""
+    segments = [
+        TranscriptSegment(
+            job=job,
+            index=index,
+            start=segment["start"],
+            end=segment["end"],
+            text=segment["text"].strip(),
+        )
+        for index, segment in enumerate(transcript.get("segments") or [])
+    ]
+    with transaction.atomic():
+        TranscriptSegment.objects.filter(job=job).delete()
+        TranscriptSegment.objects.bulk_create(segments, batch_size=EXPORT_BATCH_SIZE)
+
+
+def ensure_segments(job):
+    """
+    Backfill segment rows for jobs transcribed before they existed. Returns
+    False if the job has no transcript yet.
+    """
+    if job.segments.exists():
+        return True
+    if not job.transcript:
+        return False
+    save_segments(job, parse_transcript(job.transcript))
+    return True
+
+
+async def iter_segments(job_id, start=None, end=None):
+    """Yield (index, start, end, text) rows overlapping [start, end) seconds."""
+    segments = TranscriptSegment.objects.filter(job_id=job_id).order_by("index")
+    if start is not None:
+        segments = segments.filter(end__gt=start)
+    if end is not None:
+        segments = segments.filter(start__lt=end)
+    rows = segments.values_list("index", "start", "end", "text")
+
+    # Keyset pagination on the unique (job, index): each batch is its own
+    # short query, so no cursor or connection is held between batches
+    after = -1
+    while True:
+        batch = [row async for row in rows.filter(index__gt=after)[:EXPORT_BATCH_SIZE]]
+        for row in batch:
+            yield row
+        if len(batch) < EXPORT_BATCH_SIZE:
+            return
+        after = batch[-1][0]
+
+
+def timestamp(seconds, separator):
+    millis = round(seconds * 1000)
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02}:{minutes:02}:{secs:02}{separator}{millis:03}"
+
+
+def srt_cue(index, start, end, text):
+    return f"{index + 1}\n{timestamp(start, ',')} --> {timestamp(end, ',')}\n{text}\n\n"
+
+
+def vtt_cue(index, start, end, text):
+    # Cue text is markup in WebVTT, and may not contain the timing arrow
+    text = text.replace("&", "&amp;").replace("<", "&lt;").replace("-->", "->")
+    return f"{index + 1}\n{timestamp(start, '.')} --> {timestamp(end, '.')}\n{text}\n\n"
+
+
+def ndjson_line(index, start, end, text):
+    return json.dumps({"index": index, "start": start, "end": end, "text": text}) + "\n"
+
+
+RENDERERS = {"srt": srt_cue, "vtt": vtt_cue, "ndjson": ndjson_line}
+
+
+async def render(export_format, rows):
+    """Encode rows in ``export_format``, batched into chunks of bytes."""
+    render_row = RENDERERS[export_format]
+    pending, size = [], 0
+    if export_format == "vtt":
+        pending.append(b"WEBVTT\n\n")
+    async for row in rows:
+        piece = render_row(*row).encode()
+        pending.append(piece)
+        size += len(piece)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield b"".join(pending)
+            pending, size = [], 0
+    if pending:
+        yield b"".join(pending)
+
+
+async def gzip_stream(chunks):
+    """Compress chunks into a single gzip member, flushing after each one."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    async for chunk in chunks:
+        # Sync flush so every chunk is decodable as soon as it arrives
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def export(job_id, export_format, start=None, end=None, gzip=False):
+    """Async iterator of response body bytes for a transcript export."""
+    body = render(export_format, iter_segments(job_id, start, end))
+    return gzip_stream(body) if gzip else body
@@ -1,6 +1,8 @@
 from rest_framework import serializers, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from .history import get_page
+from .presence import get_latency_stats
 from .models import Room
 
 
@@ -43,3 +45,44 @@ class RoomDetailView(APIView):
             )
 
         return Response(RoomSerializer(room).data)
+
+
+class ChatHistoryView(APIView):
+    """Page backwards through a room's recent chat using a message id cursor."""
+
+    max_limit = 100
+
+    def get(self, request, code):
+        if not Room.objects.filter(code=code).exists():
+            return Response(
+                {"error": "Room not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            before = request.query_params.get("before")
+            before = int(before) if before else None
+            limit = min(int(request.query_params.get("limit", 50)), self.max_limit)
+        except ValueError:
+            return Response(
+                {"error": "before and limit must be integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if limit < 1:
+            return Response(
+                {"error": "limit must be positive"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        messages, next_before = get_page(code, before=before, limit=limit)
+        return Response({"messages": messages, "next_before": next_before})
+
+
+class RoomLatencyView(APIView):
+    """Per-room latency statistics for monitoring."""
+
+    def get(self, request, code):
+        if not Room.objects.filter(code=code).exists():
+            return Response(
+                {"error": "Room not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        return Response(get_latency_stats(code))
@@ -1,7 +1,9 @@
 from django.urls import path
-from .api import RoomCreateView, RoomDetailView
+from .api import ChatHistoryView, RoomCreateView, RoomDetailView, RoomLatencyView
 
 urlpatterns = [
     path("rooms/", RoomCreateView.as_view(), name="room-create"),
     path("rooms/<str:code>/", RoomDetailView.as_view(), name="room-detail"),
+    path("rooms/<str:code>/chat/", ChatHistoryView.as_view(), name="room-chat-history"),
+    path("rooms/<str:code>/latency/", RoomLatencyView.as_view(), name="room-latency"),
 ]
@@ -1,20 +1,33 @@
 import json
-import asyncio
+import math
+import time
+import uuid
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
+from streamsmart.db import database_sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from . import history, lifecycle, presence
 from .models import Room
 
 
-class WatchPartyConsumer(AsyncWebsocketConsumer):
-    # Track pending room deletions (for grace period when host refreshes)
-    pending_deletions = {}
+def now_ms():
+    return time.time() * 1000
+
 
+class WatchPartyConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.room_code = self.scope["url_route"]["kwargs"]["room_code"]
         self.room_group_name = f"watch_{self.room_code}"
         self.session_id = None
         self.username = "Anonymous"
         self.is_host = False
+        # Public roster identity; never expose session_id (it authenticates the host)
+        self.participant = None
+        self.last_heartbeat = 0
+        # Smoothed round-trip time and clock offset (server - client), in ms
+        self.rtt = None
+        self.clock_offset = None
+        self.last_pong = None
 
         # Verify room exists
         self.room = await self.get_room()
@@ -22,6 +35,9 @@ class WatchPartyConsumer(AsyncWebsocketConsumer):
             await self.close()
             return
 
+        # Any node may execute a pending room close, so each one runs a reaper
+        lifecycle.ensure_reaper()
+
         # Join the room group
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
         await self.accept()
@@ -40,49 +56,27 @@ class WatchPartyConsumer(AsyncWebsocketConsumer):
     async def disconnect(self, close_code):
         if self.is_host:
             # Host is leaving - start grace period before deleting room
-            task = asyncio.create_task(self.delayed_room_deletion())
-            WatchPartyConsumer.pending_deletions[self.room_code] = task
-        else:
-            # Regular viewer leaving - notify others
-            if self.username:
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        "type": "user_left",
-                        "username": self.username,
-                    },
-                )
+            await lifecycle.schedule_close(self.room_code)
+
+        if self.participant:
+            entry = await presence.remove_participant(
+                self.room_code, self.participant["id"]
+            )
+            if entry:
+                self.roster_batcher().participant_left(entry)
 
         # Leave the group
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
 
-    async def delayed_room_deletion(self):
-        """Wait before deleting room, in case host reconnects."""
-        await asyncio.sleep(10)  # 10 second grace period
-
-        # Check if still pending (host didn't reconnect)
-        if self.room_code in WatchPartyConsumer.pending_deletions:
-            del WatchPartyConsumer.pending_deletions[self.room_code]
-
-            # Delete the room
-            await self.delete_room()
-
-            # Notify all viewers the party is over
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    "type": "room_closed",
-                    "message": "The host has ended the watch party.",
-                },
-            )
-
     async def receive(self, text_data):
+        received_at = now_ms()
         data = json.loads(text_data)
         message_type = data.get("type")
 
         if message_type == "ping":
             # Respond immediately for latency measurement
-            await self.send(text_data=json.dumps({"type": "pong"}))
+            await self.handle_ping(data, received_at)
+            await self.refresh_presence()
         elif message_type == "join":
             await self.handle_join(data)
         elif message_type == "sync":
@@ -109,10 +103,10 @@ class WatchPartyConsumer(AsyncWebsocketConsumer):
         # Check if this user is the host
         self.is_host = self.session_id == self.room.host_session_id
 
-        # If host is reconnecting, cancel pending deletion
-        if self.is_host and self.room_code in WatchPartyConsumer.pending_deletions:
-            WatchPartyConsumer.pending_deletions[self.room_code].cancel()
-            del WatchPartyConsumer.pending_deletions[self.room_code]
+        # If host is reconnecting (to any node), cancel pending deletion
+        if self.is_host:
+            await lifecycle.cancel_close(self.room_code)
+            await self.touch_room()
 
         # Send back their role and current state
         await self.send(
@@ -125,14 +119,94 @@ class WatchPartyConsumer(AsyncWebsocketConsumer):
             )
         )
 
-        # Notify others that someone joined
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                "type": "user_joined",
-                "username": self.username,
-            },
+        # Replay recent chat so late joiners have context
+        messages, has_more = await history.get_recent(
+            self.room_code, settings.WATCHPARTY_CHAT_REPLAY
+        )
+        await self.send(
+            text_data=json.dumps(
+                {"type": "chat_history", "messages": messages, "has_more": has_more}
+            )
+        )
+
+        # Register presence; a rejoin on the same socket replaces the old entry
+        if self.participant is None:
+            self.participant = {"id": uuid.uuid4().hex[:12]}
+        self.participant.update(username=self.username, is_host=self.is_host)
+        await presence.add_participant(self.room_code, self.participant)
+        self.last_heartbeat = time.monotonic()
+
+        # Full roster snapshot for the joiner, batched diff for everyone else
+        await presence.prune_stale(self.room_code)
+        await self.send(
+            text_data=json.dumps(
+                {
+                    "type": "roster",
+                    "you": self.participant["id"],
+                    "participants": await presence.get_roster(self.room_code),
+                    "count": await presence.get_count(self.room_code),
+                }
+            )
         )
+        self.roster_batcher().participant_joined(self.participant)
+
+    async def handle_ping(self, data, received_at):
+        """
+        NTP-style exchange: the client sends its send time t0 and the time t3
+        it received our previous pong; we answer with receive/send times t1/t2.
+        The client echoes that pong's t2 with t3, and the sample is dropped
+        unless it is our last pong, since pings can overlap (the burst on
+        connect, or an RTT above the ping interval).
+        """
+        t3 = data.get("t3")
+        if (
+            self.last_pong
+            and isinstance(t3, (int, float))
+            and data.get("t2") == self.last_pong[2]
+        ):
+            t0, t1, t2 = self.last_pong
+            self.record_latency_sample((t3 - t0) - (t2 - t1), ((t1 - t0) + (t2 - t3)) / 2)
+
+        t0 = data.get("t0")
+        pong = {"type": "pong", "rtt": self.rtt, "offset": self.clock_offset}
+        if isinstance(t0, (int, float)):
+            pong.update(t0=t0, t1=received_at, t2=now_ms())
+            self.last_pong = (t0, received_at, pong["t2"])
+        await self.send(text_data=json.dumps(pong))
+
+    def record_latency_sample(self, rtt, offset):
+        """Fold a sample into the smoothed estimates (EWMA, as TCP's SRTT)."""
+        if rtt < 0:
+            return
+        if self.rtt is None:
+            self.rtt, self.clock_offset = rtt, offset
+            return
+        alpha = settings.WATCHPARTY_LATENCY_SMOOTHING
+        self.rtt += alpha * (rtt - self.rtt)
+        self.clock_offset += alpha * (offset - self.clock_offset)
+
+    def one_way_delay(self):
+        """Estimated one-way delay to this client in seconds."""
+        return (self.rtt or 0) / 2000
+
+    async def refresh_presence(self):
+        """Heartbeat this connection's presence entry, at most once per interval."""
+        if not self.participant:
+            return
+        now = time.monotonic()
+        if now - self.last_heartbeat < settings.WATCHPARTY_HEARTBEAT_INTERVAL:
+            return
+        self.last_heartbeat = now
+
+        if not await presence.heartbeat(
+            self.room_code, self.participant["id"], rtt=self.rtt
+        ):
+            # Pruned after a stall (e.g. a long GC pause) - register again
+            await presence.add_participant(self.room_code, self.participant)
+            self.roster_batcher().participant_joined(self.participant)
+
+    def roster_batcher(self):
+        return presence.RosterBatcher.for_room(self.room_code, self.room_group_name)
 
     async def handle_sync(self, data):
         """Handle playback sync - only host can control."""
@@ -144,8 +218,17 @@ class WatchPartyConsumer(AsyncWebsocketConsumer):
             )
             return
 
-        current_time = data.get("current_time", 0)
-        is_playing = data.get("is_playing", False)
+        # Viewers' consumers do arithmetic on the position, so never relay junk
+        try:
+            current_time = float(data.get("current_time", 0))
+        except (TypeError, ValueError):
+            current_time = math.nan
+        if not math.isfinite(current_time) or current_time < 0:
+            await self.send(
+                text_data=json.dumps({"type": "error", "message": "Invalid playback position"})
+            )
+            return
+        is_playing = data.get("is_playing") is True
 
         # Save to database (for new joiners)
         await self.update_room_playback(current_time, is_playing)
@@ -157,6 +240,8 @@ class WatchPartyConsumer(AsyncWebsocketConsumer):
                 "type": "sync_playback",
                 "current_time": current_time,
                 "is_playing": is_playing,
+                # Server time the host was at current_time
+                "captured_at": time.time() - self.one_way_delay(),
             },
         )
 
@@ -165,26 +250,41 @@ class WatchPartyConsumer(AsyncWebsocketConsumer):
         message = data.get("message", "").strip()
         if not message:
             return
+        if len(message.encode()) > settings.WATCHPARTY_CHAT_MAX_MESSAGE_BYTES:
+            await self.send(
+                text_data=json.dumps({"type": "error", "message": "Message is too long"})
+            )
+            return
+
+        entry = await history.append_message(self.room_code, self.username, message)
 
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 "type": "chat_message",
+                "id": entry["id"],
                 "message": message,
                 "username": self.username,
+                "sent_at": entry["sent_at"],
             },
         )
 
     # ===== Group message handlers =====
 
     async def sync_playback(self, event):
-        """Send sync update to client."""
+        """Send sync update to client, compensated for host and client latency."""
+        current_time = event["current_time"]
+        if event["is_playing"]:
+            # Where the host will be by the time this frame reaches the client
+            current_time += time.time() - event["captured_at"] + self.one_way_delay()
+
         await self.send(
             text_data=json.dumps(
                 {
                     "type": "sync",
-                    "current_time": event["current_time"],
+                    "current_time": current_time,
                     "is_playing": event["is_playing"],
+                    "compensated": True,
                 }
             )
         )
@@ -195,30 +295,23 @@ class WatchPartyConsumer(AsyncWebsocketConsumer):
             text_data=json.dumps(
                 {
                     "type": "chat",
+                    "id": event["id"],
                     "message": event["message"],
                     "username": event["username"],
+                    "sent_at": event["sent_at"],
                 }
             )
         )
 
-    async def user_joined(self, event):
-        """Notify client that a user joined."""
-        await self.send(
-            text_data=json.dumps(
-                {
-                    "type": "user_joined",
-                    "username": event["username"],
-                }
-            )
-        )
-
-    async def user_left(self, event):
-        """Notify client that a user left."""
+    async def roster_diff(self, event):
+        """Send a batch of roster changes to client."""
         await self.send(
             text_data=json.dumps(
                 {
-                    "type": "user_left",
-                    "username": event["username"],
+                    "type": "roster_diff",
+                    "joined": event["joined"],
+                    "left": event["left"],
+                    "count": event["count"],
                 }
             )
         )
@@ -247,9 +340,11 @@ class WatchPartyConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def update_room_playback(self, current_time, is_playing):
         Room.objects.filter(code=self.room_code).update(
-            current_time=current_time, is_playing=is_playing
+            current_time=current_time,
+            is_playing=is_playing,
+            last_activity_at=timezone.now(),
         )
 
     @database_sync_to_async
-    def delete_room(self):
-        Room.objects.filter(code=self.room_code).delete()
+    def touch_room(self):
+        Room.objects.filter(code=self.room_code).update(last_activity_at=timezone.now())
@@ -0,0 +1,89 @@
+import json
+import time
+
+from django.conf import settings
+
+from .store import get_async_redis, get_redis, room_key
+
+
+# ===== Chat history =====
+#
+# Each room keeps its recent chat in a Redis list used as a ring buffer,
+# capped both by message count and by total bytes, so a chatty room never
+# grows without bound and never touches the database.
+
+# Assign the next message id, append, then evict from the head until the
+# buffer is back under both caps. Runs atomically so ids stay ordered across
+# nodes. KEYS: list, sequence, byte counter. ARGV: max messages, max bytes,
+# ttl, entry JSON without an id.
+APPEND_SCRIPT = """
+local id = redis.call('INCR', KEYS[2])
+local entry = cjson.decode(ARGV[4])
+entry['id'] = id
+local raw = cjson.encode(entry)
+redis.call('RPUSH', KEYS[1], raw)
+local total = redis.call('INCRBY', KEYS[3], string.len(raw))
+local length = redis.call('LLEN', KEYS[1])
+while length > 1 and (length > tonumber(ARGV[1]) or total > tonumber(ARGV[2])) do
+    local dropped = redis.call('LPOP', KEYS[1])
+    total = redis.call('DECRBY', KEYS[3], string.len(dropped))
+    length = length - 1
+end
+for i = 1, #KEYS do
+    redis.call('EXPIRE', KEYS[i], ARGV[3])
+end
+return raw
+"""
+
+
+def _keys(room_code):
+    return (
+        room_key(room_code, "chat"),
+        room_key(room_code, "chat_seq"),
+        room_key(room_code, "chat_bytes"),
+    )
+
+
+async def append_message(room_code, username, message):
+    """Store a chat message and return it with its assigned ``id``."""
+    entry = {"username": username, "message": message, "sent_at": time.time()}
+    script = get_async_redis().register_script(APPEND_SCRIPT)
+    raw = await script(
+        keys=_keys(room_code),
+        args=[
+            settings.WATCHPARTY_CHAT_HISTORY_SIZE,
+            settings.WATCHPARTY_CHAT_HISTORY_BYTES,
+            settings.WATCHPARTY_CHAT_TTL,
+            json.dumps(entry),
+        ],
+    )
+    return json.loads(raw)
+
+
+async def get_recent(room_code, limit):
+    """Return the newest ``limit`` messages (oldest first) and whether more exist."""
+    list_key, _, _ = _keys(room_code)
+    if limit <= 0:
+        # LRANGE -0 -1 would return the whole buffer
+        return [], await get_async_redis().llen(list_key) > 0
+    async with get_async_redis().pipeline(transaction=True) as pipe:
+        pipe.lrange(list_key, -limit, -1)
+        pipe.llen(list_key)
+        raw_messages, length = await pipe.execute()
+    return [json.loads(raw) for raw in raw_messages], length > len(raw_messages)
+
+
+def get_page(room_code, before=None, limit=50):
+    """
+    Return up to ``limit`` messages older than the ``before`` id (oldest
+    first), plus the cursor for the next older page or None.
+    """
+    list_key, _, _ = _keys(room_code)
+    # The buffer is capped, so reading it whole is bounded
+    messages = [json.loads(raw) for raw in get_redis().lrange(list_key, 0, -1)]
+    if before is not None:
+        messages = [m for m in messages if m["id"] < before]
+
+    page = messages[-limit:]
+    has_more = len(messages) > len(page)
+    return page, page[0]["id"] if has_more else None
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import time
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from streamsmart.db import database_sync_to_async
+
+from .models import Room
+from .store import get_async_redis, room_key
+
+logger = logging.getLogger(__name__)
+
+# ===== Room lifecycle =====
+#
+# When a host disconnects, the room is scheduled to close by adding it to a
+# shared sorted set scored by its deadline. Any node can cancel the close
+# (host reconnected) or execute it (deadline passed) by removing the member;
+# ZREM returns 1 to exactly one caller, so the close runs exactly once.
+
+CLOSING_KEY = "watch:closing"
+
+# Per-room keys that are dropped together with the room
+ROOM_STATE_KEYS = ("presence", "roster", "latency", "chat", "chat_seq", "chat_bytes")
+
+_reaper_task = None
+
+
+async def schedule_close(room_code):
+    """Close the room after the host grace period unless cancelled."""
+    deadline = time.time() + settings.WATCHPARTY_HOST_GRACE_PERIOD
+    await get_async_redis().zadd(CLOSING_KEY, {room_code: deadline})
+
+
+async def cancel_close(room_code):
+    """Cancel a pending close. Returns False if nothing was pending."""
+    return bool(await get_async_redis().zrem(CLOSING_KEY, room_code))
+
+
+async def claim_due_closes():
+    """Claim rooms whose grace period ran out; each room is claimed by one node."""
+    redis = get_async_redis()
+    due = await redis.zrangebyscore(CLOSING_KEY, "-inf", time.time())
+    if not due:
+        return []
+
+    async with redis.pipeline(transaction=False) as pipe:
+        for room_code in due:
+            pipe.zrem(CLOSING_KEY, room_code)
+        claimed = await pipe.execute()
+    return [room_code for room_code, won in zip(due, claimed) if won]
+
+
+async def close_room(room_code):
+    """Delete the room and its shared state, then notify everyone still in it."""
+    deleted = await delete_room(room_code)
+    await get_async_redis().delete(
+        *(room_key(room_code, name) for name in ROOM_STATE_KEYS)
+    )
+    if not deleted:
+        return
+
+    await get_channel_layer().group_send(
+        f"watch_{room_code}",
+        {
+            "type": "room_closed",
+            "message": "The host has ended the watch party.",
+        },
+    )
+
+
+async def run_reaper():
+    """Periodically execute due room closes claimed by this node."""
+    while True:
+        await asyncio.sleep(settings.WATCHPARTY_REAPER_INTERVAL)
+        try:
+            for room_code in await claim_due_closes():
+                await close_room(room_code)
+        except Exception:
+            logger.exception("Watch party reaper pass failed")
+
+
+def ensure_reaper():
+    """Start this process's reaper on the running loop if it isn't already."""
+    global _reaper_task
+    if _reaper_task is None or _reaper_task.done():
+        _reaper_task = asyncio.get_running_loop().create_task(run_reaper())
+
+
+@database_sync_to_async
+def delete_room(room_code):
+    deleted, _ = Room.objects.filter(code=room_code).delete()
+    return deleted > 0
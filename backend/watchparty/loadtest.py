@@ -0,0 +1,225 @@
+"""
+Load generator for the watch party WebSocket tier.
+
+Drives ``WatchPartyConsumer`` in-process through Channels testing
+communicators: R rooms, each with one host and V viewers, the host sending
+playback syncs and everyone chatting at configurable rates. Used by the
+``watchparty_loadtest`` management command and the test suite.
+"""
+
+import asyncio
+import json
+import resource
+import statistics
+import time
+import uuid
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from streamsmart.db import database_sync_to_async
+
+from . import routing
+from .models import Room
+
+# How long to let roster diffs and in-flight broadcasts drain after the run
+SETTLE_SECONDS = 1.0
+
+
+class Client:
+    """One simulated participant and the timings it observed."""
+
+    def __init__(self, application, room, username, session_id):
+        self.room = room
+        self.username = username
+        self.session_id = session_id
+        self.communicator = WebsocketCommunicator(
+            application, f"/ws/watch/{room['code']}/"
+        )
+        self.reader = None
+        self.joined = asyncio.Event()
+        self.connect_latency = None
+        self.received = 0
+        self.sync_latencies = []
+        self.chat_latencies = []
+
+    async def connect(self):
+        started = time.perf_counter()
+        connected, _ = await self.communicator.connect(timeout=10)
+        if not connected:
+            raise RuntimeError(f"{self.username} was refused by room {self.room['code']}")
+
+        self.reader = asyncio.create_task(self.read())
+        await self.send(
+            {"type": "join", "session_id": self.session_id, "username": self.username}
+        )
+        # Joined means the roster snapshot arrived, i.e. the room is usable
+        await asyncio.wait_for(self.joined.wait(), timeout=10)
+        self.connect_latency = time.perf_counter() - started
+
+    async def send(self, message):
+        await self.communicator.send_to(text_data=json.dumps(message))
+
+    async def read(self):
+        while True:
+            # No timeout: on timeout the communicator cancels the consumer
+            output = await self.communicator.receive_output(timeout=None)
+            if output["type"] != "websocket.send":
+                return
+            received_at = time.perf_counter()
+            self.received += 1
+
+            message = json.loads(output["text"])
+            if message["type"] == "roster":
+                self.joined.set()
+            elif message["type"] == "sync":
+                sent_at = self.room["sync_sent"].get(message["current_time"])
+                if sent_at is not None:
+                    self.sync_latencies.append(received_at - sent_at)
+            elif message["type"] == "chat":
+                sent_at = float(message["message"].split(" ", 1)[0])
+                self.chat_latencies.append(received_at - sent_at)
+
+    async def disconnect(self):
+        if self.reader:
+            self.reader.cancel()
+        await self.communicator.disconnect()
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize_latencies(samples):
+    """Summarize latency samples in milliseconds."""
+    if not samples:
+        return {"count": 0, "p50_ms": None, "p99_ms": None, "mean_ms": None}
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+    }
+
+
+def current_rss():
+    """Resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        # No procfs (macOS); fall back to peak RSS, reported in bytes there
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+@database_sync_to_async
+def create_rooms(count):
+    return [
+        Room.objects.create(
+            video_url="https://www.youtube.com/watch?v=loadtest",
+            host_session_id=uuid.uuid4().hex,
+        )
+        for _ in range(count)
+    ]
+
+
+@database_sync_to_async
+def delete_rooms(rooms):
+    Room.objects.filter(id__in=[room.id for room in rooms]).delete()
+
+
+async def drive_host(host, duration, sync_rate):
+    if sync_rate <= 0:
+        return
+    interval = 1 / sync_rate
+    deadline = time.perf_counter() + duration
+    position = 0.0
+    while time.perf_counter() < deadline:
+        # Paused syncs echo current_time unmodified, so it doubles as a tag
+        position += 1.0
+        host.room["sync_sent"][position] = time.perf_counter()
+        await host.send({"type": "sync", "current_time": position, "is_playing": False})
+        await asyncio.sleep(interval)
+
+
+async def drive_chatter(client, duration, chat_rate):
+    if chat_rate <= 0:
+        return
+    interval = 1 / chat_rate
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        await client.send({"type": "chat", "message": f"{time.perf_counter()} hello"})
+        await asyncio.sleep(interval)
+
+
+async def run_load_test(rooms=10, viewers=10, duration=10.0, sync_rate=1.0, chat_rate=0.2):
+    """
+    Run the load test and return a report dict.
+
+    ``sync_rate`` is host syncs per second per room; ``chat_rate`` is chat
+    messages per second per participant.
+    """
+    application = URLRouter(routing.websocket_urlpatterns)
+    room_objects = await create_rooms(rooms)
+    clients = []
+
+    try:
+        rss_before = current_rss()
+        for room_object in room_objects:
+            room = {"code": room_object.code, "sync_sent": {}}
+            clients.append(
+                Client(application, room, f"host-{room['code']}", room_object.host_session_id)
+            )
+            clients.extend(
+                Client(application, room, f"viewer-{room['code']}-{i}", uuid.uuid4().hex)
+                for i in range(viewers)
+            )
+
+        await asyncio.gather(*(client.connect() for client in clients))
+        rss_connected = current_rss()
+
+        hosts = clients[:: viewers + 1]
+        cpu_before = cpu_seconds()
+        received_before = sum(client.received for client in clients)
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(drive_host(host, duration, sync_rate) for host in hosts),
+            *(drive_chatter(client, duration, chat_rate) for client in clients),
+        )
+        # Throughput is over the traffic phase; what arrives while settling
+        # was sent during it
+        traffic_elapsed = time.perf_counter() - started
+        await asyncio.sleep(SETTLE_SECONDS)
+        elapsed = time.perf_counter() - started
+        cpu_used = cpu_seconds() - cpu_before
+        received = sum(client.received for client in clients) - received_before
+    finally:
+        await asyncio.gather(
+            *(client.disconnect() for client in clients), return_exceptions=True
+        )
+        await delete_rooms(room_objects)
+
+    connections = len(clients)
+    return {
+        "rooms": rooms,
+        "viewers_per_room": viewers,
+        "connections": connections,
+        "duration_s": round(traffic_elapsed, 3),
+        "connect": summarize_latencies([c.connect_latency for c in clients]),
+        "sync_fanout": summarize_latencies(
+            [sample for client in clients for sample in client.sync_latencies]
+        ),
+        "chat_fanout": summarize_latencies(
+            [sample for client in clients for sample in client.chat_latencies]
+        ),
+        "messages_per_sec": round(received / traffic_elapsed, 1),
+        "cpu_percent_per_connection": round(cpu_used / elapsed / connections * 100, 4),
+        "rss_bytes_per_connection": max(0, rss_connected - rss_before) // connections,
+    }
@@ -0,0 +1,42 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from watchparty.loadtest import run_load_test
+
+
+class Command(BaseCommand):
+    help = "Simulate rooms x viewers against WatchPartyConsumer and report latency and cost."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=10)
+        parser.add_argument("--viewers", type=int, default=10, help="Viewers per room, besides the host.")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds to generate traffic.")
+        parser.add_argument("--sync-rate", type=float, default=1.0, help="Host syncs per second per room.")
+        parser.add_argument("--chat-rate", type=float, default=0.2, help="Chat messages per second per participant.")
+        parser.add_argument(
+            "--in-memory-layer",
+            action="store_true",
+            help="Use the in-memory channel layer instead of the configured one.",
+        )
+
+    def handle(self, *args, **options):
+        layers = settings.CHANNEL_LAYERS
+        if options["in_memory_layer"]:
+            layers = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+        with override_settings(CHANNEL_LAYERS=layers):
+            report = asyncio.run(
+                run_load_test(
+                    rooms=options["rooms"],
+                    viewers=options["viewers"],
+                    duration=options["duration"],
+                    sync_rate=options["sync_rate"],
+                    chat_rate=options["chat_rate"],
+                )
+            )
+
+        self.stdout.write(json.dumps(report, indent=2))
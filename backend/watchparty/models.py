@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 import uuid
 
 
@@ -14,6 +15,8 @@ class Room(models.Model):
     is_playing = models.BooleanField(default=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped by host activity; the maintenance reaper deletes rooms idle past a cutoff
+    last_activity_at = models.DateTimeField(default=timezone.now, db_index=True)
 
     def save(self, *args, **kwargs):
         if not self.code:
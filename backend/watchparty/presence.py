@@ -0,0 +1,206 @@
+import asyncio
+import json
+import time
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .store import get_async_redis, get_redis, room_key
+
+
+# ===== Presence store =====
+#
+# Each room keeps a sorted set of participant ids scored by their last
+# heartbeat, plus a hash of participant id -> roster entry. Sockets that drop
+# without a clean disconnect stop heartbeating and are pruned by score.
+
+
+def _keys(room_code):
+    return room_key(room_code, "presence"), room_key(room_code, "roster")
+
+
+def _latency_key(room_code):
+    return room_key(room_code, "latency")
+
+
+async def add_participant(room_code, entry):
+    """Register a participant (``{"id", "username", "is_host"}``) in a room."""
+    presence_key, roster_key = _keys(room_code)
+    ttl = settings.WATCHPARTY_PRESENCE_TTL
+    async with get_async_redis().pipeline(transaction=True) as pipe:
+        pipe.zadd(presence_key, {entry["id"]: time.time()})
+        pipe.hset(roster_key, entry["id"], json.dumps(entry))
+        # Keys outlive their members by a margin so an empty room cleans up
+        pipe.expire(presence_key, ttl * 2)
+        pipe.expire(roster_key, ttl * 2)
+        await pipe.execute()
+
+
+async def heartbeat(room_code, participant_id, rtt=None):
+    """
+    Refresh a participant's heartbeat and, if known, their smoothed RTT in
+    ms. Returns False if they were pruned.
+    """
+    presence_key, roster_key = _keys(room_code)
+    latency_key = _latency_key(room_code)
+    ttl = settings.WATCHPARTY_PRESENCE_TTL
+    async with get_async_redis().pipeline(transaction=True) as pipe:
+        pipe.zadd(presence_key, {participant_id: time.time()}, xx=True, ch=True)
+        pipe.zscore(presence_key, participant_id)
+        if rtt is not None:
+            pipe.hset(latency_key, participant_id, round(rtt, 1))
+        for key in (presence_key, roster_key, latency_key):
+            pipe.expire(key, ttl * 2)
+        results = await pipe.execute()
+    return results[1] is not None
+
+
+async def remove_participant(room_code, participant_id):
+    """Remove a participant. Returns their roster entry if they were present."""
+    presence_key, roster_key = _keys(room_code)
+    async with get_async_redis().pipeline(transaction=True) as pipe:
+        pipe.hget(roster_key, participant_id)
+        pipe.zrem(presence_key, participant_id)
+        pipe.hdel(roster_key, participant_id)
+        pipe.hdel(_latency_key(room_code), participant_id)
+        raw, removed, _, _ = await pipe.execute()
+    if not removed or raw is None:
+        return None
+    return json.loads(raw)
+
+
+async def prune_stale(room_code):
+    """Drop participants whose heartbeat expired and return their entries."""
+    presence_key, roster_key = _keys(room_code)
+    cutoff = time.time() - settings.WATCHPARTY_PRESENCE_TTL
+    redis = get_async_redis()
+
+    stale = await redis.zrangebyscore(presence_key, "-inf", cutoff)
+    if not stale:
+        return []
+
+    raw_entries = await redis.hmget(roster_key, stale)
+    async with redis.pipeline(transaction=True) as pipe:
+        for participant_id in stale:
+            pipe.zrem(presence_key, participant_id)
+        pipe.hdel(roster_key, *stale)
+        pipe.hdel(_latency_key(room_code), *stale)
+        results = await pipe.execute()
+
+    # Only report members this call actually removed, so concurrent pruners
+    # on other nodes don't announce the same departure twice
+    return [
+        json.loads(raw)
+        for raw, removed in zip(raw_entries, results[:-2])
+        if removed and raw is not None
+    ]
+
+
+async def get_roster(room_code):
+    """Return the full list of roster entries for a room."""
+    _, roster_key = _keys(room_code)
+    return [json.loads(raw) for raw in await get_async_redis().hvals(roster_key)]
+
+
+async def get_count(room_code):
+    """Return the number of participants in a room (O(1) ZCARD)."""
+    presence_key, _ = _keys(room_code)
+    return await get_async_redis().zcard(presence_key)
+
+
+def get_latency_stats(room_code):
+    """Summarize the room's per-connection smoothed RTTs (ms) for monitoring."""
+    samples = sorted(float(rtt) for rtt in get_redis().hvals(_latency_key(room_code)))
+    if not samples:
+        return {"connections": 0}
+
+    def pick(fraction):
+        return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+    return {
+        "connections": len(samples),
+        "rtt_ms": {
+            "mean": round(sum(samples) / len(samples), 1),
+            "p50": pick(0.50),
+            "p95": pick(0.95),
+            "max": samples[-1],
+        },
+    }
+
+
+# ===== Batched roster diffs =====
+
+
+class RosterBatcher:
+    """
+    Coalesces joins and leaves for a room into one ``roster_diff`` broadcast
+    per interval, so a burst of N joins costs N fan-outs instead of N².
+    Batching is per process; each node flushes the changes it observed.
+    """
+
+    # Active batchers in this process, keyed by room code
+    batchers = {}
+
+    def __init__(self, room_code, group_name):
+        self.room_code = room_code
+        self.group_name = group_name
+        self.joined = {}
+        self.left = {}
+        self.flush_task = None
+
+    @classmethod
+    def for_room(cls, room_code, group_name):
+        batcher = cls.batchers.get(room_code)
+        if batcher is None:
+            batcher = cls.batchers[room_code] = cls(room_code, group_name)
+        return batcher
+
+    def participant_joined(self, entry):
+        self.record_joined(entry)
+        self.schedule_flush()
+
+    def participant_left(self, entry):
+        self.record_left(entry)
+        self.schedule_flush()
+
+    def record_joined(self, entry):
+        # A leave followed by a rejoin in the same window is a no-op for others
+        if self.left.pop(entry["id"], None) is None:
+            self.joined[entry["id"]] = entry
+
+    def record_left(self, entry):
+        if self.joined.pop(entry["id"], None) is None:
+            self.left[entry["id"]] = entry
+
+    def schedule_flush(self):
+        # A task left over from a finished event loop counts as no task
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(settings.WATCHPARTY_ROSTER_DIFF_INTERVAL)
+        self.flush_task = None
+
+        for entry in await prune_stale(self.room_code):
+            self.record_left(entry)
+
+        joined = list(self.joined.values())
+        left = list(self.left.values())
+        self.joined.clear()
+        self.left.clear()
+
+        if self.flush_task is None:
+            RosterBatcher.batchers.pop(self.room_code, None)
+
+        if not joined and not left:
+            return
+
+        await get_channel_layer().group_send(
+            self.group_name,
+            {
+                "type": "roster_diff",
+                "joined": joined,
+                "left": left,
+                "count": await get_count(self.room_code),
+            },
+        )
@@ -0,0 +1,38 @@
+import asyncio
+import weakref
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+# redis.asyncio connection pools are bound to the event loop that created
+# them, so keep one client per loop (daphne runs a single loop, tests may not)
+_async_clients = weakref.WeakKeyDictionary()
+_sync_client = None
+
+
+def get_async_redis():
+    """Return the asyncio Redis client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = redis.asyncio.Redis.from_url(
+            settings.WATCHPARTY_REDIS_URL, decode_responses=True
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def get_redis():
+    """Return the blocking Redis client used by REST views and tasks."""
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.Redis.from_url(
+            settings.WATCHPARTY_REDIS_URL, decode_responses=True
+        )
+    return _sync_client
+
+
+def room_key(room_code, name):
+    """Build the Redis key holding ``name`` state for a room."""
+    return f"watch:{room_code}:{name}"
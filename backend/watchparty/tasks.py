@@ -0,0 +1,55 @@
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from .lifecycle import CLOSING_KEY, ROOM_STATE_KEYS
+from .models import Room
+from .store import get_redis, room_key
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def reap_abandoned_rooms():
+    """
+    Delete rooms idle past WATCHPARTY_ROOM_IDLE_TTL (e.g. created but never
+    joined, or orphaned when a node died mid grace period), in bounded batches.
+    Rooms that still have live participants are touched and kept.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.WATCHPARTY_ROOM_IDLE_TTL)
+    stale = Room.objects.filter(last_activity_at__lt=cutoff).order_by("last_activity_at")
+    redis = get_redis()
+    deleted = kept = 0
+
+    while True:
+        batch = list(stale.values_list("id", "code")[: settings.MAINTENANCE_BATCH_SIZE])
+        if not batch:
+            break
+
+        pipe = redis.pipeline(transaction=False)
+        for _, code in batch:
+            pipe.zcard(room_key(code, "presence"))
+        occupied = pipe.execute()
+
+        active_ids = [room_id for (room_id, _), n in zip(batch, occupied) if n]
+        idle = [(room_id, code) for (room_id, code), n in zip(batch, occupied) if not n]
+
+        # Touching occupied rooms takes them out of the stale set, so the loop ends
+        kept += Room.objects.filter(id__in=active_ids).update(last_activity_at=now)
+        # Re-check the cutoff so a room a host just resumed isn't deleted
+        deleted += Room.objects.filter(
+            id__in=[room_id for room_id, _ in idle], last_activity_at__lt=cutoff
+        ).delete()[0]
+
+        pipe = redis.pipeline(transaction=False)
+        for _, code in idle:
+            pipe.delete(*(room_key(code, name) for name in ROOM_STATE_KEYS))
+            pipe.zrem(CLOSING_KEY, code)
+        pipe.execute()
+
+    logger.info("Reaped %d abandoned rooms (%d still occupied)", deleted, kept)
+    return {"rooms_deleted": deleted, "rooms_kept": kept}
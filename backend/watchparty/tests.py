@@ -1,3 +1,252 @@
-from django.test import TestCase
+import asyncio
+import json
+import time
+from unittest import mock
 
-# Create your tests here.
+import fakeredis
+from channels.layers import get_channel_layer
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from . import history, lifecycle, presence, store
+from .loadtest import run_load_test
+
+
+class FakeRedisMixin:
+    """Point the shared room state at an in-process fakeredis server."""
+
+    def setUp(self):
+        super().setUp()
+        self.redis_server = fakeredis.FakeServer()
+        patcher = mock.patch.object(
+            store,
+            "_sync_client",
+            fakeredis.FakeRedis(server=self.redis_server, decode_responses=True),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_async(self, coro):
+        async def run():
+            self.redis = fakeredis.aioredis.FakeRedis(
+                server=self.redis_server, decode_responses=True
+            )
+            store._async_clients[asyncio.get_running_loop()] = self.redis
+            try:
+                return await coro
+            finally:
+                await self.redis.aclose()
+
+        return asyncio.run(run())
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    WATCHPARTY_PRESENCE_TTL=30,
+    WATCHPARTY_ROSTER_DIFF_INTERVAL=0,
+)
+class PresenceTests(FakeRedisMixin, SimpleTestCase):
+    def entry(self, participant_id):
+        return {"id": participant_id, "username": participant_id, "is_host": False}
+
+    def test_join_and_leave_in_one_window_cancel_out(self):
+        batcher = presence.RosterBatcher("room", "watch_room")
+
+        batcher.record_joined(self.entry("a"))
+        batcher.record_left(self.entry("a"))
+        batcher.record_left(self.entry("b"))
+        batcher.record_joined(self.entry("b"))
+        batcher.record_joined(self.entry("c"))
+
+        self.assertEqual(batcher.joined, {"c": self.entry("c")})
+        self.assertEqual(batcher.left, {})
+
+    def test_flush_broadcasts_one_coalesced_diff(self):
+        async def scenario():
+            layer = get_channel_layer()
+            channel = await layer.new_channel()
+            await layer.group_add("watch_room", channel)
+            for participant_id in ("a", "b"):
+                await presence.add_participant("room", self.entry(participant_id))
+
+            batcher = presence.RosterBatcher.for_room("room", "watch_room")
+            batcher.record_joined(self.entry("a"))
+            batcher.record_joined(self.entry("b"))
+            batcher.record_joined(self.entry("gone"))
+            batcher.record_left(self.entry("gone"))
+            await batcher.flush_later()
+            return await layer.receive(channel), presence.RosterBatcher.batchers
+
+        diff, batchers = self.run_async(scenario())
+
+        self.assertEqual([entry["id"] for entry in diff["joined"]], ["a", "b"])
+        self.assertEqual(diff["left"], [])
+        self.assertEqual(diff["count"], 2)
+        self.assertNotIn("room", batchers)
+
+    def test_prune_returns_expired_participants(self):
+        async def scenario():
+            for participant_id in ("stale", "live"):
+                await presence.add_participant("room", self.entry(participant_id))
+            presence_key, _ = presence._keys("room")
+            await self.redis.zadd(presence_key, {"stale": time.time() - 60})
+
+            pruned = await presence.prune_stale("room")
+            return pruned, await presence.get_roster("room"), await presence.prune_stale("room")
+
+        pruned, roster, pruned_again = self.run_async(scenario())
+
+        self.assertEqual(pruned, [self.entry("stale")])
+        self.assertEqual(roster, [self.entry("live")])
+        self.assertEqual(pruned_again, [])
+
+    def test_prune_skips_participants_removed_concurrently(self):
+        async def scenario():
+            await presence.add_participant("room", self.entry("stale"))
+            presence_key, _ = presence._keys("room")
+            await self.redis.zadd(presence_key, {"stale": time.time() - 60})
+
+            # Another node removes the participant between our read and delete
+            hmget = self.redis.hmget
+
+            async def hmget_then_remove(*args):
+                entries = await hmget(*args)
+                await presence.remove_participant("room", "stale")
+                return entries
+
+            with mock.patch.object(self.redis, "hmget", hmget_then_remove):
+                return await presence.prune_stale("room")
+
+        self.assertEqual(self.run_async(scenario()), [])
+
+
+@override_settings(WATCHPARTY_CHAT_HISTORY_SIZE=5, WATCHPARTY_CHAT_HISTORY_BYTES=10_000)
+class ChatHistoryTests(FakeRedisMixin, SimpleTestCase):
+    def append(self, *messages):
+        async def scenario():
+            return [await history.append_message("room", "ann", m) for m in messages]
+
+        return self.run_async(scenario())
+
+    def test_evicts_oldest_past_message_count(self):
+        self.append(*(f"message {i}" for i in range(1, 8)))
+
+        messages, has_more = self.run_async(history.get_recent("room", 10))
+
+        self.assertEqual([m["id"] for m in messages], [3, 4, 5, 6, 7])
+        self.assertEqual(messages[0]["message"], "message 3")
+        self.assertFalse(has_more)
+
+    def test_evicts_oldest_past_byte_budget(self):
+        with self.settings(WATCHPARTY_CHAT_HISTORY_BYTES=300):
+            self.append(*("x" * 50 for _ in range(6)))
+
+        list_key, _, bytes_key = history._keys("room")
+        stored = store.get_redis().lrange(list_key, 0, -1)
+        total = int(store.get_redis().get(bytes_key))
+
+        ids = [json.loads(raw)["id"] for raw in stored]
+        # Well under the 5 message cap: the byte budget did the evicting
+        self.assertEqual(ids, [5, 6])
+        self.assertLessEqual(total, 300)
+        # The byte counter tracks what is actually in the buffer
+        self.assertEqual(total, sum(len(raw) for raw in stored))
+
+    def test_keeps_a_message_larger_than_the_budget(self):
+        with self.settings(WATCHPARTY_CHAT_HISTORY_BYTES=10):
+            self.append("first", "too long for the budget")
+
+        messages, _ = self.run_async(history.get_recent("room", 10))
+
+        self.assertEqual([m["message"] for m in messages], ["too long for the budget"])
+
+    def test_recent_reports_older_messages(self):
+        self.append("a", "b", "c")
+
+        messages, has_more = self.run_async(history.get_recent("room", 2))
+
+        self.assertEqual([m["message"] for m in messages], ["b", "c"])
+        self.assertTrue(has_more)
+        self.assertEqual(self.run_async(history.get_recent("room", 0)), ([], True))
+
+    def test_pages_walk_back_with_cursors(self):
+        self.append(*"abcde")
+
+        page, cursor = history.get_page("room", limit=2)
+        self.assertEqual(([m["id"] for m in page], cursor), ([4, 5], 4))
+
+        page, cursor = history.get_page("room", before=cursor, limit=2)
+        self.assertEqual(([m["id"] for m in page], cursor), ([2, 3], 2))
+
+        page, cursor = history.get_page("room", before=cursor, limit=2)
+        self.assertEqual(([m["id"] for m in page], cursor), ([1], None))
+
+
+@override_settings(WATCHPARTY_HOST_GRACE_PERIOD=0)
+class RoomClosingTests(FakeRedisMixin, SimpleTestCase):
+    def test_each_due_room_is_claimed_once(self):
+        async def scenario():
+            for room_code in ("r1", "r2", "r3"):
+                await lifecycle.schedule_close(room_code)
+
+            # Both nodes read the same due rooms before either claims any
+            barrier = asyncio.Barrier(2)
+            zrangebyscore = self.redis.zrangebyscore
+
+            async def read_then_wait(*args):
+                due = await zrangebyscore(*args)
+                await barrier.wait()
+                return due
+
+            with mock.patch.object(self.redis, "zrangebyscore", read_then_wait):
+                return await asyncio.gather(
+                    lifecycle.claim_due_closes(), lifecycle.claim_due_closes()
+                )
+
+        first, second = self.run_async(scenario())
+
+        self.assertEqual(sorted(first + second), ["r1", "r2", "r3"])
+        self.assertFalse(set(first) & set(second))
+
+    def test_cancelled_and_future_closes_are_not_claimed(self):
+        async def scenario():
+            await lifecycle.schedule_close("cancelled")
+            await lifecycle.schedule_close("due")
+            with self.settings(WATCHPARTY_HOST_GRACE_PERIOD=60):
+                await lifecycle.schedule_close("later")
+
+            return (
+                await lifecycle.cancel_close("cancelled"),
+                await lifecycle.cancel_close("cancelled"),
+                await lifecycle.claim_due_closes(),
+            )
+
+        cancelled, cancelled_again, claimed = self.run_async(scenario())
+
+        self.assertTrue(cancelled)
+        self.assertFalse(cancelled_again)
+        self.assertEqual(claimed, ["due"])
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    WATCHPARTY_ROSTER_DIFF_INTERVAL=0.1,
+)
+class WatchPartyLoadTest(FakeRedisMixin, TransactionTestCase):
+    """Small end-to-end run of the load harness."""
+
+    def test_every_viewer_receives_broadcasts(self):
+        report = self.run_async(
+            run_load_test(rooms=2, viewers=3, duration=1.0, sync_rate=4, chat_rate=2)
+        )
+
+        self.assertEqual(report["connections"], 8)
+        self.assertEqual(report["connect"]["count"], 8)
+        # Each of the 4 participants in a room sees every sync its host sent
+        self.assertGreaterEqual(report["sync_fanout"]["count"], 2 * 4 * 3)
+        self.assertGreater(report["chat_fanout"]["count"], 0)
+        self.assertGreater(report["messages_per_sec"], 0)
+        # Settling after the traffic isn't counted as run time
+        self.assertLess(report["duration_s"], 1.5)
+        self.assertLessEqual(
+            report["sync_fanout"]["p50_ms"], report["sync_fanout"]["p99_ms"]
+        )
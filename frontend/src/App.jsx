@@ -19,7 +19,7 @@ function Summarizer() {
       const data = await response.json();
       setJob(data);
 
-      if (data.status === 'COMPLETED') {
+      if (data.status === 'COMPLETED' || data.status === 'FAILED') {
         clearInterval(pollIntervalRef.current);
         pollIntervalRef.current = null;
       }
@@ -50,6 +50,14 @@ function Summarizer() {
         body: JSON.stringify({ url: url }),
       });
 
+      if (response.status === 429) {
+        // Server is shedding load; tell the user roughly how long the queue is
+        const busy = await response.json();
+        const minutes = Math.max(1, Math.round(busy.eta_seconds / 60));
+        setError(`We're busy right now (queue position ${busy.queue_position}, about ${minutes} min). Please try again later.`);
+        return;
+      }
+
       if (!response.ok) {
         throw new Error('Failed to create job');
       }
@@ -96,6 +104,8 @@ function Summarizer() {
         return 'Analyzing content...';
       case 'COMPLETED':
         return 'Complete!';
+      case 'FAILED':
+        return "Couldn't process this video. Check the URL and try again.";
       default:
         return status;
     }
@@ -109,12 +119,12 @@ function Summarizer() {
             type='text'
             value={url}
             onChange={(e) => setUrl(e.target.value)}
-            disabled={isSubmitting || (job && job.status !== 'COMPLETED')}
+            disabled={isSubmitting || (job && !['COMPLETED', 'FAILED'].includes(job.status))}
           />
         </label>
         <input
           type='submit'
-          disabled={isSubmitting || (job && job.status !== 'COMPLETED')}
+          disabled={isSubmitting || (job && !['COMPLETED', 'FAILED'].includes(job.status))}
         />
       </form>
 
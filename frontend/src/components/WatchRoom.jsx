@@ -28,6 +28,7 @@ function WatchRoom({ roomCode, sessionId, username }) {
     videoUrl,
     syncState,
     chatMessages,
+    participantCount,
     error,
     roomClosed,
     sendSync,
@@ -235,6 +236,9 @@ function WatchRoom({ roomCode, sessionId, username }) {
       <div className="watch-room-header">
         <h2>Watch Party: {roomCode}</h2>
         <div className="watch-room-controls">
+          <span className="participant-count">
+            {participantCount} watching
+          </span>
           <span
             className={`connection-status ${isConnected ? 'connected' : 'disconnected'}`}
           >
@@ -14,6 +14,8 @@ export function useWatchParty(roomCode, sessionId, username) {
   const [isHost, setIsHost] = useState(false);
   const [videoUrl, setVideoUrl] = useState('');
   const [chatMessages, setChatMessages] = useState([]);
+  const [participants, setParticipants] = useState([]);
+  const [participantCount, setParticipantCount] = useState(0);
   const [syncState, setSyncState] = useState({ currentTime: 0, isPlaying: false });
   const [error, setError] = useState(null);
   const [roomClosed, setRoomClosed] = useState(false);
@@ -22,6 +24,9 @@ export function useWatchParty(roomCode, sessionId, username) {
   const latencyRef = useRef(0);
   const latencySamplesRef = useRef([]);
   const pingTimestampRef = useRef(null);
+  // The last pong's send time (t2) and the wall-clock time it arrived (t3),
+  // echoed to the server so it can pair t3 with the right exchange
+  const lastPongRef = useRef(null);
 
   useEffect(() => {
     if (!roomCode || !sessionId || !username) return;
@@ -57,7 +62,14 @@ export function useWatchParty(roomCode, sessionId, username) {
     const measureLatency = () => {
       if (ws.current?.readyState === WebSocket.OPEN) {
         pingTimestampRef.current = performance.now();
-        ws.current.send(JSON.stringify({ type: 'ping' }));
+        ws.current.send(
+          JSON.stringify({
+            type: 'ping',
+            t0: Date.now(),
+            t2: lastPongRef.current?.t2,
+            t3: lastPongRef.current?.t3,
+          })
+        );
       }
     };
 
@@ -80,8 +92,14 @@ export function useWatchParty(roomCode, sessionId, username) {
 
       switch (data.type) {
         case 'pong':
-          // Calculate round-trip time and use rolling average
-          if (pingTimestampRef.current) {
+          // Only pongs answering a timestamped ping feed the server's estimate
+          if (data.t0 !== undefined) {
+            lastPongRef.current = { t2: data.t2, t3: Date.now() };
+          }
+          // Prefer the server's smoothed RTT; fall back to a local rolling average
+          if (data.rtt != null) {
+            latencyRef.current = data.rtt / 2000;
+          } else if (pingTimestampRef.current) {
             const rtt = performance.now() - pingTimestampRef.current;
             const oneWayMs = rtt / 2;
 
@@ -103,8 +121,11 @@ export function useWatchParty(roomCode, sessionId, username) {
           break;
 
         case 'sync':
-          // Compensate for network latency - add latency to catch up to where host actually is
-          const compensatedTime = data.current_time + latencyRef.current;
+          // Compensate for network latency - add latency to catch up to where host actually is,
+          // unless the server already did (it knows both the host's and our delay)
+          const compensatedTime = data.compensated
+            ? data.current_time
+            : data.current_time + latencyRef.current;
           setSyncState({
             currentTime: compensatedTime,
             isPlaying: data.is_playing,
@@ -115,34 +136,59 @@ export function useWatchParty(roomCode, sessionId, username) {
           setChatMessages((prev) => [
             ...prev,
             {
+              id: data.id,
               username: data.username,
               message: data.message,
-              timestamp: new Date(),
+              timestamp: new Date(data.sent_at * 1000),
             },
           ]);
           break;
 
-        case 'user_joined':
-          setChatMessages((prev) => [
-            ...prev,
-            {
-              type: 'system',
-              message: `${data.username} joined the party`,
-              timestamp: new Date(),
-            },
-          ]);
+        case 'chat_history':
+          // Replayed on join; skip anything that already arrived live
+          setChatMessages((prev) => {
+            const seen = new Set(prev.map((m) => m.id));
+            const replayed = data.messages
+              .filter((m) => !seen.has(m.id))
+              .map((m) => ({
+                id: m.id,
+                username: m.username,
+                message: m.message,
+                timestamp: new Date(m.sent_at * 1000),
+              }));
+            return [...replayed, ...prev];
+          });
+          break;
+
+        case 'roster':
+          // Full snapshot on join
+          setParticipants(data.participants);
+          setParticipantCount(data.count);
           break;
 
-        case 'user_left':
+        case 'roster_diff': {
+          // Batched joins/leaves since the last diff
+          const leftIds = new Set(data.left.map((p) => p.id));
+          setParticipants((prev) => [
+            ...prev.filter((p) => !leftIds.has(p.id) && !data.joined.some((j) => j.id === p.id)),
+            ...data.joined,
+          ]);
+          setParticipantCount(data.count);
           setChatMessages((prev) => [
             ...prev,
-            {
+            ...data.joined.map((p) => ({
               type: 'system',
-              message: `${data.username} left the party`,
+              message: `${p.username} joined the party`,
               timestamp: new Date(),
-            },
+            })),
+            ...data.left.map((p) => ({
+              type: 'system',
+              message: `${p.username} left the party`,
+              timestamp: new Date(),
+            })),
           ]);
           break;
+        }
 
         case 'room_closed':
           setRoomClosed(true);
@@ -200,6 +246,8 @@ export function useWatchParty(roomCode, sessionId, username) {
     videoUrl,
     syncState,
     chatMessages,
+    participants,
+    participantCount,
     error,
     roomClosed,
     sendSync,
@@ -18,7 +18,7 @@ python manage.py migrate --no-input
 
 # Start Celery worker in background
 if [ -n "$CELERY_BROKER_URL" ]; then
-    celery -A streamsmart worker -l warning &
+    celery -A streamsmart worker -B -l warning &
 fi
 
 # Start the server